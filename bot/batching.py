@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class SpamBatcher:
+    """
+    Микро-пакетная проверка сообщений на спам.
+    Тексты копятся не дольше window секунд (или до max_size штук) и
+    проверяются одним вызовом score_func. Если трафика нет, пакет
+    отправляется сразу, без ожидания окна.
+    """
+
+    def __init__(self, score_func, window: float = 0.005, max_size: int = 64):
+        self.score_func = score_func  # async (list[str]) -> list[(is_spam, prob)]
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._pending = []
+        self._timer = None
+        self._last_arrival = 0.0
+        # запущенные пакеты: ссылка нужна, иначе задачу может собрать сборщик мусора
+        self._tasks = set()
+        self.batch_sizes = Counter()
+        self.batches = 0
+        self.messages = 0
+
+    async def check(self, text):
+        """Ставит текст в очередь и ждёт результат (is_spam, prob)"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+
+        now = time.monotonic()
+        quiet = now - self._last_arrival > self.window
+        self._last_arrival = now
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            delay = 0 if quiet else self.window
+            self._timer = loop.call_later(delay, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_soon(self._flush)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Пакет проверки спама завершился с ошибкой: {task.exception()!r}")
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.messages += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        logger.debug(f"Пакет проверки спама: {len(batch)} сообщений")
+        try:
+            results = await self.score_func([text for text, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def get_stats(self) -> dict:
+        """Фактические размеры пакетов с момента запуска"""
+        return {
+            'batches': self.batches,
+            'messages': self.messages,
+            'avg_batch': self.messages / self.batches if self.batches else 0.0,
+            'max_batch': max(self.batch_sizes) if self.batch_sizes else 0,
+            'batch_sizes': dict(sorted(self.batch_sizes.items())),
+        }
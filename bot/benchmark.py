@@ -0,0 +1,213 @@
+"""
+Бенчмарк проверки спама: реплей сообщений из CSV через check_spam и через
+более быстрые пути классификатора. Каждый вариант запускается в отдельном
+процессе со своими переменными окружения (пиковый RSS не смешивается).
+
+    python bot/benchmark.py [--csv data/combined.csv] [--limit N] [--batch-size 32]
+                            [--variants check_spam,sklearn,...] [--output results/benchmark.json]
+
+Для каждого варианта два режима (по одному сообщению и пакетами), в каждом —
+прогон с пустыми кэшами (cold) и повторный прогон тех же сообщений (warm).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# вариант -> (функция проверки, переменные окружения)
+VARIANTS = {
+    'check_spam': ('check_spam', {}),
+    'check_spam_norules': ('check_spam', {'PREFILTER_RULES': ''}),
+    'check_spam_fast': ('check_spam', {'MODEL_BUNDLE': '1', 'LEMMA_TABLE': '1'}),
+    'sklearn': ('score_batch', {}),
+    'fused': ('score_batch', {'SPAM_FUSED_SCORER': '1'}),
+    'bundle': ('score_batch', {'MODEL_BUNDLE': '1'}),
+    'bundle_int8': ('score_batch', {'MODEL_BUNDLE': '1', 'MODEL_PRECISION': 'int8'}),
+    'lemma_table': ('score_batch', {'SPAM_FUSED_SCORER': '1', 'LEMMA_TABLE': '1'}),
+}
+
+
+def read_texts(path, limit=None):
+    """Тексты из столбца text любого CSV"""
+    with open(path, encoding='utf-8', newline='') as f:
+        texts = [row.get('text') or '' for row in csv.DictReader(f)]
+    return texts[:limit] if limit else texts
+
+
+def summarize(latencies, elapsed):
+    from src import utils as src_utils
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'msgs_per_sec': len(ms) / elapsed if elapsed else 0.0,
+        'peak_rss_mb': src_utils.peak_rss_mb(),
+    }
+
+
+def _chunks(texts, size):
+    return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+
+async def _replay_check_spam(texts, batch_size):
+    import utils
+
+    latencies = []
+
+    async def timed(text):
+        start = time.perf_counter()
+        await utils.check_spam(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if batch_size == 1:
+        for text in texts:
+            await timed(text)
+    else:
+        # сообщения пакета приходят одновременно, их собирает SpamBatcher
+        for chunk in _chunks(texts, batch_size):
+            await asyncio.gather(*(timed(t) for t in chunk))
+    return latencies, time.perf_counter() - start
+
+
+def _replay_score_batch(texts, batch_size):
+    import classifier
+
+    latencies = []
+    start = time.perf_counter()
+    for chunk in _chunks(texts, batch_size):
+        t0 = time.perf_counter()
+        classifier.score_batch(chunk)
+        latencies.extend([time.perf_counter() - t0] * len(chunk))
+    return latencies, time.perf_counter() - start
+
+
+def _reset_caches():
+    import classifier
+    from src import preprocessing as p
+
+    p.lemma_cache.clear()
+    if 'utils' in sys.modules:
+        sys.modules['utils'].verdict_cache.invalidate()
+    model = classifier.get_model()
+    if model.lemmatizer is not None:
+        model.lemmatizer.clear()
+
+
+async def run_variant(args):
+    """Выполняется в дочернем процессе: все прогоны одного варианта"""
+    import classifier
+
+    func, _ = VARIANTS[args.variant]
+    texts = read_texts(args.csv, args.limit)
+    start = time.perf_counter()
+    if func == 'check_spam':
+        import utils
+        await utils.warmup.run(utils.warm_up)
+    else:
+        classifier.score_batch(classifier.SAMPLE_TEXTS)
+    load_seconds = time.perf_counter() - start
+
+    runs = []
+    for mode, batch_size in (('single', 1), ('batched', args.batch_size)):
+        _reset_caches()
+        for cache in ('cold', 'warm'):
+            if func == 'check_spam':
+                latencies, elapsed = await _replay_check_spam(texts, batch_size)
+            else:
+                latencies, elapsed = _replay_score_batch(texts, batch_size)
+            runs.append({'variant': args.variant, 'mode': mode, 'batch_size': batch_size, 'cache': cache,
+                         'mean_ms': float(np.mean(latencies)) * 1000, **summarize(latencies, elapsed)})
+    prefilter = sys.modules['utils'].prefilter.get_stats() if func == 'check_spam' else None
+    print(json.dumps({'version': classifier.get_model().version, 'load_seconds': load_seconds, 'runs': runs,
+                      'prefilter': prefilter}))
+
+
+def missing_artifacts(env):
+    from src.utils import get_paths
+
+    paths = get_paths()
+    missing = []
+    if env.get('MODEL_BUNDLE') == '1' and not os.path.exists(os.path.join(paths['bundle'], 'current.json')):
+        missing.append(paths['bundle'])
+    if env.get('LEMMA_TABLE') == '1' and not os.path.exists(os.path.join(paths['lemma_table'], 'manifest.json')):
+        missing.append(paths['lemma_table'])
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Реплей сообщений через проверку спама')
+    parser.add_argument('--csv', default=os.path.join(project_root, 'data', 'combined.csv'),
+                        help='CSV со столбцом text')
+    parser.add_argument('--limit', type=int, default=None, help='сколько сообщений взять')
+    parser.add_argument('--batch-size', type=int, default=32, help='размер пакета в пакетном режиме')
+    parser.add_argument('--variants', default=','.join(VARIANTS), help='варианты через запятую')
+    parser.add_argument('--output', default=os.path.join(project_root, 'results', 'benchmark.json'),
+                        help='куда записать JSON с результатами')
+    parser.add_argument('--variant', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.append(project_root)
+    if args.variant:
+        asyncio.run(run_variant(args))
+        return
+
+    texts = read_texts(args.csv, args.limit)
+    print(f"Сообщений: {len(texts)} из {args.csv}")
+    report = {
+        'csv': os.path.abspath(args.csv),
+        'messages': len(texts),
+        'batch_size': args.batch_size,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'versions': {},
+        'load_seconds': {},
+        'prefilter': {},
+        'runs': [],
+    }
+    print(f"  {'вариант':<18} {'режим':<8} {'кэш':<5} {'сред., мс':>9} {'p50, мс':>8} {'p95, мс':>8} "
+          f"{'p99, мс':>8} {'сообщ./с':>9} {'RSS, МБ':>8}")
+    for name in args.variants.split(','):
+        _, env = VARIANTS[name]
+        missing = missing_artifacts(env)
+        if missing:
+            print(f"  {name:<18} пропущен: нет {', '.join(missing)}")
+            continue
+        cmd = [sys.executable, os.path.abspath(__file__), '--variant', name, '--csv', args.csv,
+               '--batch-size', str(args.batch_size)]
+        if args.limit:
+            cmd += ['--limit', str(args.limit)]
+        out = subprocess.run(cmd, env={**os.environ, **env}, capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        report['versions'][name] = result['version']
+        report['load_seconds'][name] = result['load_seconds']
+        if result['prefilter'] and result['prefilter']['seen']:
+            report['prefilter'][name] = result['prefilter']
+        for r in result['runs']:
+            report['runs'].append(r)
+            print(f"  {name:<18} {r['mode']:<8} {r['cache']:<5} {r['mean_ms']:9.3f} {r['p50_ms']:8.3f} "
+                  f"{r['p95_ms']:8.3f} {r['p99_ms']:8.3f} {r['msgs_per_sec']:9.0f} {r['peak_rss_mb']:8.1f}")
+
+    for name, stats in report['prefilter'].items():
+        shares = ', '.join(f"{rule} {share:.1%}" for rule, share in stats['shares'].items())
+        print(f"Правила в {name}: решено {stats['settled_share']:.1%} ({shares}), {stats['avg_us']:.1f} мкс на сообщение")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import csv
+import logging
+import os
+import re
+import sys
+import time
+import joblib
+import numpy as np
+from scipy.sparse import hstack
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+from src import utils as src_utils, preprocessing as p
+from src.scorer import FusedLinearScorer
+from src.lemma_table import LemmaTable
+from src.model_bundle import load_bundle
+from src.online_model import load_snapshot
+from stage_timing import StageTimings
+from config import (
+    SPAM_STAGE_TIMING, SPAM_FUSED_SCORER, MODEL_BUNDLE, MODEL_PRECISION, LEMMA_CACHE_SIZE, LEMMA_CACHE_PRELOAD,
+    LEMMA_TABLE, SECOND_STAGE_ENABLED, ONLINE_MODEL
+)
+
+logger = logging.getLogger(__name__)
+
+p.lemma_cache.resize(LEMMA_CACHE_SIZE)
+
+# время этапов score_batch (в воркерах пула копится до передачи в основной процесс)
+STAGES = ['single_chars', 'tokenize', 'lemmatize', 'features', 'transform', 'padding', 'model', 'total']
+stage_timings = StageTimings(STAGES)
+
+
+def detect_single_chars_spam(text, threshold=0.5):
+    """
+    Обнаружение сообщений с большим количеством одиночных символов
+    threshold - порог (если доля одиночных символов > threshold, считаем спамом)
+    """
+    if not text or len(text.strip()) < 10:
+        return False
+    
+    words = text.split()
+    if len(words) < 3:
+        return False
+    
+    single_chars = 0
+    for word in words:
+        clean_word = re.sub(r'[^\w]', '', word)
+        if len(clean_word) == 1 and clean_word.isalnum():
+            single_chars += 1
+    
+    ratio = single_chars / len(words)
+    
+    return ratio > threshold
+
+
+class SpamModel:
+    """
+    Загруженная модель: sklearn-модель с векторайзером и/или свёрнутый скорер.
+    При загрузке из бандла sklearn-объектов нет, проверка идёт только скорером.
+    """
+
+    def __init__(self, model, vectorizer, scorer=None, version=None, lemmatizer=None):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.scorer = scorer
+        self.version = version
+        self.lemmatizer = lemmatizer
+        self.spam_col = list(model.classes_).index('spam') if model is not None else None
+
+
+_model = None
+_second_stage = None
+
+# тестовые сообщения для прогрева и проверки новой модели
+SAMPLE_TEXTS = [
+    'Всем привет! Подскажите, во сколько завтра собрание?',
+    'Заработок от 5000 рублей в день, без вложений, пишите в личку',
+    'с п а м',
+]
+
+
+def artifact_paths():
+    """Файлы, от которых зависит загруженная модель"""
+    ps = src_utils.get_paths()
+    if ONLINE_MODEL:
+        paths = [os.path.join(ps['online'], 'current.json')]
+    elif MODEL_BUNDLE:
+        paths = [os.path.join(ps['bundle'], 'current.json')]
+    else:
+        paths = [ps['model'], ps['vectorizer']]
+    if LEMMA_TABLE:
+        paths.append(os.path.join(ps['lemma_table'], 'manifest.json'))
+    if SECOND_STAGE_ENABLED:
+        paths.append(ps['second_stage'])
+    return paths
+
+def artifact_fingerprint():
+    """(путь, mtime, размер) файлов модели — меняется при переобучении"""
+    result = []
+    for path in artifact_paths():
+        try:
+            st = os.stat(path)
+            result.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            result.append((path, None, None))
+    return tuple(result)
+
+def build_model():
+    """Загружает модель из путей src.utils.get_paths(), не подменяя текущую"""
+    ps = src_utils.get_paths()
+    if ONLINE_MODEL:
+        # снимок онлайн-модели работает как скорер: тот же вход (clean_text и доп. признаки)
+        online = load_snapshot(ps['online'])
+        loaded = SpamModel(None, None, online, online.version)
+    elif MODEL_BUNDLE:
+        bundle = load_bundle(ps['bundle'])
+        if bundle.feature_columns != p.FEATURE_COLUMNS:
+            logger.warning(f"Доп. признаки бандла {bundle.version} не совпадают с preprocessing.FEATURE_COLUMNS")
+        loaded = SpamModel(None, None, FusedLinearScorer.from_bundle(bundle), bundle.version)
+    else:
+        m = joblib.load(ps['model'])
+        v = joblib.load(ps['vectorizer'])
+        scorer = FusedLinearScorer.from_sklearn(m, v) if SPAM_FUSED_SCORER else None
+        version = time.strftime('%Y%m%d_%H%M%S', time.localtime(os.path.getmtime(ps['model'])))
+        loaded = SpamModel(m, v, scorer, version)
+    if isinstance(loaded.scorer, FusedLinearScorer) and loaded.scorer.precision != MODEL_PRECISION:
+        loaded.scorer = loaded.scorer.quantize(MODEL_PRECISION)
+    if LEMMA_TABLE:
+        loaded.lemmatizer = LemmaTable.load(ps['lemma_table'])
+    return loaded
+
+def validate_model(sm):
+    """Проверяет модель на SAMPLE_TEXTS; ValueError, если она непригодна"""
+    if sm.scorer is not None:
+        n_extra = len(sm.scorer.extra_weights)
+    else:
+        n_extra = sm.model.coef_.shape[1] - len(sm.vectorizer.vocabulary_)
+    if n_extra != len(p.FEATURE_COLUMNS):
+        raise ValueError(
+            f"Модель {sm.version} ожидает {n_extra} доп. признаков, "
+            f"а preprocessing.FEATURE_COLUMNS — {len(p.FEATURE_COLUMNS)}"
+        )
+    probs = np.asarray(_predict_proba(sm, SAMPLE_TEXTS), dtype=np.float64)
+    if probs.shape != (len(SAMPLE_TEXTS),) or not np.all(np.isfinite(probs)) \
+            or probs.min() < 0 or probs.max() > 1:
+        raise ValueError(f"Модель {sm.version} вернула некорректные вероятности: {probs}")
+    return sm
+
+def install_model(sm):
+    """Делает sm текущей моделью; уже идущие проверки доработают на старой"""
+    global _model, _second_stage
+    if sm.lemmatizer is not None:
+        p.set_lemmatizer(sm.lemmatizer)
+    _model = sm
+    # вторая модель перечитается при следующем обращении
+    _second_stage = None
+    return sm
+
+def load_model():
+    """Загружает модель и векторайзер из путей src.utils.get_paths()"""
+    return install_model(build_model())
+
+def get_model():
+    """Возвращает загруженную модель, загружая её при первом обращении"""
+    if _model is None:
+        load_model()
+    return _model
+
+def preload_lemma_cache():
+    """Предзагружает кэш лемм словами обучающего корпуса (если включено)"""
+    if not LEMMA_CACHE_PRELOAD or LEMMA_TABLE:
+        return 0
+    path = src_utils.get_paths()['combined']
+    try:
+        with open(path, encoding='utf-8', newline='') as f:
+            size = p.lemma_cache.preload(row.get('text') or '' for row in csv.DictReader(f))
+    except OSError as e:
+        logger.warning(f"Не удалось предзагрузить кэш лемм из {path}: {e}")
+        return 0
+    logger.info(f"Кэш лемм предзагружен: {size} слов")
+    return size
+
+def _align_extra_features(m, add, n_text_features):
+    """Подгоняет число доп. признаков под то, что ожидает модель"""
+    try:
+        expected_add = m.coef_.shape[1] - n_text_features
+        current_add = add.shape[1]
+        if current_add < expected_add:
+            pad = np.zeros((add.shape[0], expected_add - current_add), dtype=add.dtype)
+            add = np.hstack([add, pad])
+        elif current_add > expected_add:
+            add = add[:, :expected_add]
+    except Exception:
+        pass
+    return add
+
+def _lap(timings, stage, start):
+    """Записывает время этапа, если замеры включены; возвращает текущий момент"""
+    if timings is None:
+        return start
+    now = time.perf_counter_ns()
+    timings.record(stage, now - start)
+    return now
+
+def _predict_proba(sm, texts, timings=None):
+    """Вероятности спама для списка текстов"""
+    t = time.perf_counter_ns() if timings is not None else 0
+    tokens = [p.tokenize(x) for x in texts]
+    t = _lap(timings, 'tokenize', t)
+    cleaned = [p.lemmatize_tokens(x) for x in tokens]
+    t = _lap(timings, 'lemmatize', t)
+    add = p.extract_features_matrix(cleaned)
+    t = _lap(timings, 'features', t)
+    if sm.scorer is not None:
+        probs = sm.scorer.predict_proba_many(cleaned, add)
+        _lap(timings, 'model', t)
+        return probs
+    X = sm.vectorizer.transform(cleaned)
+    t = _lap(timings, 'transform', t)
+    add = _align_extra_features(sm.model, add, X.shape[1])
+    t = _lap(timings, 'padding', t)
+    probs = sm.model.predict_proba(hstack([X, add]).tocsr())[:, sm.spam_col]
+    _lap(timings, 'model', t)
+    return probs
+
+def score_batch(texts):
+    """Синхронная пакетная проверка: список (is_spam, prob) в порядке texts"""
+    timings = stage_timings if SPAM_STAGE_TIMING else None
+    start = t = time.perf_counter_ns() if timings is not None else 0
+    results = [None] * len(texts)
+    model_idx = []
+    for i, text in enumerate(texts):
+        if detect_single_chars_spam(text):
+            results[i] = (True, 0.95)
+        else:
+            model_idx.append(i)
+    _lap(timings, 'single_chars', t)
+    if model_idx:
+        probs = _predict_proba(get_model(), [texts[i] for i in model_idx], timings)
+        for prob, i in zip(probs, model_idx):
+            results[i] = (bool(prob > 0.5), float(prob))
+    _lap(timings, 'total', start)
+    return results
+
+def score_batch_with_timings(texts):
+    """
+    score_batch для воркера пула: результаты, накопленные замеры этапов
+    и счётчики кэша лемм (с pid воркера)
+    """
+    return score_batch(texts), stage_timings.drain(), (os.getpid(), p.lemma_cache.drain())
+
+def get_second_stage():
+    """Вторая модель (символьные n-граммы), загружается при первом обращении"""
+    global _second_stage
+    if _second_stage is None:
+        _second_stage = joblib.load(src_utils.get_paths()['second_stage'])
+    return _second_stage
+
+def score_second_stage(texts):
+    """Вероятности спама второй моделью по исходному тексту (без clean_text)"""
+    pipeline = get_second_stage()
+    spam_col = list(pipeline.classes_).index('spam')
+    probs = pipeline.predict_proba([t.lower() for t in texts])[:, spam_col]
+    return [float(prob) for prob in probs]
@@ -20,6 +20,54 @@ TEMPLATE_EXAMPLE = '#Ваша_услуга Текст объявления\nКо
 HINT_DELETE_DELAY = 300
 VOTE_LOG_PATH = 'bot_votes.csv'
 
+# пакетная проверка спама: окно ожидания (мс) и максимальный размер пакета
+SPAM_BATCH_WINDOW_MS = float(os.getenv('SPAM_BATCH_WINDOW_MS', '5'))
+SPAM_BATCH_MAX_SIZE = int(os.getenv('SPAM_BATCH_MAX_SIZE', '64'))
+# число процессов для проверки спама вне event loop (0 — проверять в основном процессе)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0'))
+# сколько секунд сообщение ждёт прогрева модели после запуска (потом — только эвристика)
+WARMUP_MAX_WAIT = float(os.getenv('WARMUP_MAX_WAIT', '10'))
+# как часто (с) проверять, не переобучена ли модель (0 — только вручную из меню админа)
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '30'))
+# кэш вердиктов по тексту сообщения: время жизни (с) и предельный объём (байт)
+VERDICT_CACHE_TTL = float(os.getenv('VERDICT_CACHE_TTL', '900'))
+VERDICT_CACHE_MAX_BYTES = int(os.getenv('VERDICT_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+# индекс почти-дубликатов подтверждённого спама (0 в NEAR_DUP_ENABLED — выключить)
+NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', '1') == '1'
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0.7'))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv('NEAR_DUP_MAX_ENTRIES', '10000'))
+NEAR_DUP_MAX_AGE = float(os.getenv('NEAR_DUP_MAX_AGE', str(24 * 3600)))
+# замеры времени этапов проверки спама (0 — выключить)
+SPAM_STAGE_TIMING = os.getenv('SPAM_STAGE_TIMING', '1') == '1'
+# метрики Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (0 — не запускать)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# правила перед моделью (single_chars, trusted, short, empty; пусто — без правил). single_chars всегда первое;
+# trusted и short отмечают сообщение как не спам без модели, поэтому по умолчанию выключены,
+# empty отдаёт вердикт модели для пустого clean_text
+PREFILTER_RULES = [r.strip() for r in os.getenv('PREFILTER_RULES', 'single_chars,empty').split(',') if r.strip()]
+PREFILTER_SHORT_MAX_CHARS = int(os.getenv('PREFILTER_SHORT_MAX_CHARS', '12'))
+# доверенные отправители (id через запятую) в дополнение к ADMIN_IDS
+PREFILTER_TRUSTED_IDS = [int(x) for x in os.getenv('PREFILTER_TRUSTED_IDS', '').split(',') if x.strip()]
+# вторая модель (src/train_second_stage.py) для сообщений с вероятностью в полосе [LOW, HIGH];
+# решение по ним принимается в фоне, после её ответа (1 — включить)
+SECOND_STAGE_ENABLED = os.getenv('SECOND_STAGE_ENABLED', '0') == '1'
+SECOND_STAGE_LOW = float(os.getenv('SECOND_STAGE_LOW', '0.35'))
+SECOND_STAGE_HIGH = float(os.getenv('SECOND_STAGE_HIGH', '0.65'))
+# свёрнутый линейный скорер вместо sklearn при проверке (1 — включить)
+SPAM_FUSED_SCORER = os.getenv('SPAM_FUSED_SCORER', '0') == '1'
+# загрузка модели из бандла models/bundle (memory-map) вместо pickle-файлов; включает свёрнутый скорер
+MODEL_BUNDLE = os.getenv('MODEL_BUNDLE', '0') == '1'
+# точность весов свёрнутого скорера: float64, float16 или int8 (с масштабом)
+MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'float64')
+# онлайн-модель из снимков models/online (src/online_learning.py) вместо основной (1 — включить)
+ONLINE_MODEL = os.getenv('ONLINE_MODEL', '0') == '1'
+# кэш лемм pymorphy2: размер и предзагрузка словами обучающего корпуса при старте
+LEMMA_CACHE_SIZE = int(os.getenv('LEMMA_CACHE_SIZE', '100000'))
+LEMMA_CACHE_PRELOAD = os.getenv('LEMMA_CACHE_PRELOAD', '0') == '1'
+# лемматизация по предвычисленной таблице (models/lemma_table/) без pymorphy2
+LEMMA_TABLE = os.getenv('LEMMA_TABLE', '0') == '1'
+
 # состояния ConversationHandler
 (
     MENU, CHOOSE_GROUP, CHOOSE_MODE, CHOOSE_GROUP_HINT, 
@@ -1,4 +1,5 @@
 import logging
+import pandas as pd
 from telegram import (
     Update, InlineKeyboardButton, InlineKeyboardMarkup, 
     ReplyKeyboardMarkup, KeyboardButton, InputFile
@@ -8,6 +9,7 @@ from config import *
 from storage import *
 from utils import *
 from scheduler import content_scheduler
+from metrics import verdicts_total
 
 logger = logging.getLogger(__name__)
 
@@ -337,7 +339,8 @@ async def content_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
                 buttons = [
                     [InlineKeyboardButton('📖 Руководство', callback_data='start|guide'), InlineKeyboardButton('⚙️ Настройки', callback_data='start|settings')],
                     [InlineKeyboardButton('✅ Подписаться', callback_data='start|subscribe'), InlineKeyboardButton('🚫 Отписаться', callback_data='start|unsubscribe')],
-                    [InlineKeyboardButton('🧰 Меню контента', callback_data='cmenu|root')]
+                    [InlineKeyboardButton('🧰 Меню контента', callback_data='cmenu|root')],
+                    [InlineKeyboardButton('🧪 Проверка спама', callback_data='start|spamstats')]
                 ]
             else:
                 text = 'Приветствую! Я бот Русской Общины г. Томск. Подписаться на рассылку?'
@@ -378,6 +381,56 @@ async def content_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
             buttons.append([InlineKeyboardButton('⬅️ В начало', callback_data='start|root')])
             await query.edit_message_text('Выберите группу для настройки:', reply_markup=InlineKeyboardMarkup(buttons))
             return MENU
+        if sub == 'spamstats':
+            if not is_admin(user.id):
+                await query.answer('Недоступно', show_alert=False)
+                return MENU
+            buttons = [
+                [InlineKeyboardButton('🔄 Обновить', callback_data='start|spamstats')],
+                [InlineKeyboardButton('⏱ Этапы проверки', callback_data='start|spamstages')],
+                [InlineKeyboardButton('♻️ Перезагрузить модель', callback_data='start|reloadmodel')],
+                [InlineKeyboardButton('⬅️ В начало', callback_data='start|root')],
+            ]
+            try:
+                await query.edit_message_text(get_spam_stats_text(), reply_markup=InlineKeyboardMarkup(buttons))
+            except Exception:
+                pass
+            return MENU
+        if sub in ('spamstages', 'spamstages_reset'):
+            if not is_admin(user.id):
+                await query.answer('Недоступно', show_alert=False)
+                return MENU
+            if sub == 'spamstages_reset':
+                stage_timings.reset()
+            buttons = [
+                [InlineKeyboardButton('🔄 Обновить', callback_data='start|spamstages'),
+                 InlineKeyboardButton('🗑 Сбросить', callback_data='start|spamstages_reset')],
+                [InlineKeyboardButton('🧪 Проверка спама', callback_data='start|spamstats')],
+                [InlineKeyboardButton('⬅️ В начало', callback_data='start|root')],
+            ]
+            try:
+                await query.edit_message_text(get_stage_stats_text(), reply_markup=InlineKeyboardMarkup(buttons))
+            except Exception:
+                pass
+            return MENU
+        if sub == 'reloadmodel':
+            if not is_admin(user.id):
+                await query.answer('Недоступно', show_alert=False)
+                return MENU
+            if not warmup.ready and not warmup.failed:
+                await query.answer('Модель ещё прогревается', show_alert=True)
+                return MENU
+            ok = await model_reloader.reload()
+            if ok:
+                text = f'✅ Модель перезагружена: {model_reloader.version}'
+            else:
+                text = f'❌ Новая модель отклонена, работает прежняя.\n{model_reloader.last_error}'
+            buttons = [
+                [InlineKeyboardButton('🧪 Проверка спама', callback_data='start|spamstats')],
+                [InlineKeyboardButton('⬅️ В начало', callback_data='start|root')],
+            ]
+            await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(buttons))
+            return MENU
         if sub == 'subscribe':
             if content_scheduler.is_subscriber(user.id):
                 await query.edit_message_text('ℹ️ Вы уже подписаны на рассылку.', reply_markup=_start_menu_btn())
@@ -1571,10 +1624,30 @@ async def handle_group_message(update: Update, context: ContextTypes.DEFAULT_TYP
             return
     #проверка на спам
     mode = chat_modes.get(chat.id, 'auto')
-    is_spam, prob = await check_spam(msg_text)
+    is_spam, prob = await check_spam(msg_text, getattr(msg.from_user, 'id', None))
     logging.debug(f"Группа {chat.id}: режим={mode}, spam_prob={prob:.3f}")
+    if needs_second_opinion(prob):
+        # спорный случай: решает вторая модель в фоне, обработчик не ждёт
+        context.application.create_task(
+            _act_after_second_opinion(context, msg, chat, msg_text, mode, is_spam, prob)
+        )
+        return
+    verdicts_total.inc(mode, 'spam' if is_spam else 'ham')
     if not is_spam:
         return
+    await act_on_spam(context, msg, chat, msg_text, mode)
+
+async def _act_after_second_opinion(context, msg, chat, msg_text, mode, is_spam, prob):
+    verdict = await second_opinion(msg_text, is_spam)
+    if verdict is not None:
+        logging.debug(f"Группа {chat.id}: вторая модель {prob:.3f} -> {verdict[1]:.3f}")
+        is_spam = verdict[0]
+    verdicts_total.inc(mode, 'spam' if is_spam else 'ham')
+    if is_spam:
+        await act_on_spam(context, msg, chat, msg_text, mode)
+
+async def act_on_spam(context, msg, chat, msg_text, mode):
+    """Удаляет спам (режим auto) или открывает голосование"""
     if mode == 'auto':
         try:
             log_vote_result(msg_text, 'spam', getattr(msg.from_user, 'id', None))
@@ -1697,7 +1770,8 @@ async def start_private(update: Update, context: ContextTypes.DEFAULT_TYPE):
         buttons = [
             [InlineKeyboardButton('📖 Руководство', callback_data='start|guide'), InlineKeyboardButton('⚙️ Настройки', callback_data='start|settings')],
             [InlineKeyboardButton('✅ Подписаться', callback_data='start|subscribe'), InlineKeyboardButton('🚫 Отписаться', callback_data='start|unsubscribe')],
-            [InlineKeyboardButton('🧰 Меню контента', callback_data='cmenu|root')]
+            [InlineKeyboardButton('🧰 Меню контента', callback_data='cmenu|root')],
+            [InlineKeyboardButton('🧪 Проверка спама', callback_data='start|spamstats')]
         ]
     else:
         text = 'Приветствую! Я бот Русской Общины г. Томск. Подписаться на рассылку?'
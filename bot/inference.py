@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import classifier
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    """Инициализация процесса-воркера: модель загружается один раз"""
+    classifier.load_model()
+    classifier.preload_lemma_cache()
+
+
+def _validate_worker():
+    """Проверка модели, загруженной воркером; возвращает её версию"""
+    return classifier.validate_model(classifier.get_model()).version
+
+
+class InferenceExecutor:
+    """
+    Выполняет проверку спама вне event loop.
+    workers == 0 — проверка прямо в event loop (как раньше),
+    workers > 0 — в пуле процессов; упавший пул пересоздаётся.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._pool = None
+        self.restarts = 0
+        # размер кэша лемм в каждом воркере текущего пула (pid -> записей)
+        self._lemma_cache_sizes = {}
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+        logger.info(f"Запущен пул проверки спама: {self.workers} процесс(ов)")
+        return pool
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = self._new_pool()
+        return self._pool
+
+    def _restart_pool(self):
+        old, self._pool = self._pool, None
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+        self._lemma_cache_sizes.clear()
+        self.restarts += 1
+
+    async def score(self, texts):
+        """Возвращает список (is_spam, prob) для texts"""
+        if self.workers <= 0:
+            return classifier.score_batch(texts)
+        results, timings, (pid, lemma_stats) = await self._run_in_pool(
+            classifier.score_batch_with_timings, texts)
+        classifier.stage_timings.merge(timings)
+        # счётчики воркеров копятся в кэше основного процесса: сам он при пуле не лемматизирует
+        classifier.p.lemma_cache.merge(lemma_stats)
+        self._lemma_cache_sizes[pid] = lemma_stats['size']
+        return results
+
+    def lemma_cache_stats(self) -> dict:
+        """Статистика кэша лемм: своя при workers == 0, иначе сумма по воркерам пула"""
+        stats = classifier.p.lemma_cache.get_stats()
+        if self.workers > 0:
+            stats['size'] = sum(self._lemma_cache_sizes.values())
+            stats['max_size'] *= self.workers
+        return stats
+
+    async def score_second_stage(self, texts):
+        """
+        Вероятности спама второй моделью. Она тяжелее основной, поэтому даже
+        при workers == 0 считается не в event loop, а в отдельном потоке.
+        """
+        if self.workers <= 0:
+            return await asyncio.get_running_loop().run_in_executor(None, classifier.score_second_stage, texts)
+        return await self._run_in_pool(classifier.score_second_stage, texts)
+
+    async def _run_in_pool(self, func, *args):
+        loop = asyncio.get_running_loop()
+        for attempt in (1, 2):
+            pool = self._get_pool()
+            try:
+                return await loop.run_in_executor(pool, func, *args)
+            except BrokenProcessPool as e:
+                logger.error(f"Процесс проверки спама упал ({e}), перезапускаю пул")
+                if self._pool is pool:
+                    self._restart_pool()
+                if attempt == 2:
+                    raise
+
+    async def replace_pool(self):
+        """
+        Запускает новый пул (воркеры загружают модель заново) и проверяет
+        модель в каждом процессе. При успехе новый пул заменяет старый,
+        а старый доделывает уже отправленные пакеты и останавливается.
+        Возвращает версию модели; при ошибке новый пул закрывается.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._new_pool()
+        try:
+            versions = await asyncio.gather(
+                *(loop.run_in_executor(pool, _validate_worker) for _ in range(self.workers))
+            )
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        old, self._pool = self._pool, pool
+        if old is not None:
+            old.shutdown(wait=False)
+        # у воркеров нового пула кэши пустые
+        self._lemma_cache_sizes.clear()
+        return versions[0]
+
+    def shutdown(self):
+        """Останавливает пул процессов"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
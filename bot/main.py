@@ -1,21 +1,56 @@
 #.\venv\Scripts\Activate.ps1 
 #python bot/main.py
+import asyncio
 import logging
 from telegram.ext import ApplicationBuilder, JobQueue
 from telegram.ext import CommandHandler, CallbackQueryHandler, MessageHandler, filters
 
-from config import TOKEN
+from config import TOKEN, MODEL_RELOAD_INTERVAL, METRICS_PORT, METRICS_HOST
 from handlers import (
     conv, settemplate, unsettemplate, delete_message_command, 
     handle_group_message, vote_callback, content_menu_callback, spam_exceptions_callback
 )
-from scheduler import check_and_send_scheduled_content
+from scheduler import check_and_send_scheduled_content, content_scheduler
+from storage import votes
+from utils import inference_executor, warmup, warm_up, check_model_update
+import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _lemma_cache_counts():
+    stats = inference_executor.lemma_cache_stats()
+    return {'hit': stats['hits'], 'miss': stats['misses'], 'eviction': stats['evictions']}
+
+async def start_metrics(app):
+    metrics.registry.add_callback(
+        'spam_bot_votes_pending', 'Голосования, ожидающие решения (len(votes))', 'gauge', lambda: len(votes))
+    metrics.registry.add_callback(
+        'spam_bot_broadcast_messages_total', 'Отправки рассылок ContentScheduler', 'counter',
+        lambda: {'sent': content_scheduler.sent_total, 'failed': content_scheduler.failed_total}, ['result'])
+    metrics.registry.add_callback(
+        'spam_bot_lemma_cache_total', 'Обращения к кэшу лемм (все воркеры): hit, miss, eviction', 'counter',
+        _lemma_cache_counts, ['result'])
+    metrics.registry.add_callback(
+        'spam_bot_lemma_cache_entries', 'Записей в кэше лемм (сумма по воркерам)', 'gauge',
+        lambda: inference_executor.lemma_cache_stats()['size'])
+    app.bot_data['metrics_server'] = await metrics.start_server(METRICS_HOST, METRICS_PORT)
+    app.bot_data['loop_lag_task'] = asyncio.create_task(metrics.monitor_loop_lag())
+
+async def on_startup(app):
+    # модель прогревается в фоне, опрос Telegram начинается сразу
+    app.bot_data['warmup_task'] = asyncio.create_task(warmup.run(warm_up))
+    if METRICS_PORT:
+        await start_metrics(app)
+
+async def on_shutdown(app):
+    inference_executor.shutdown()
+    server = app.bot_data.get('metrics_server')
+    if server is not None:
+        server.close()
+
 def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = ApplicationBuilder().token(TOKEN).post_init(on_startup).post_shutdown(on_shutdown).build()
     
     app.add_handler(conv)
     app.add_handler(CommandHandler('settemplate', settemplate))
@@ -24,7 +59,9 @@ def main():
     
     media_with_caption = (filters.PHOTO | filters.VIDEO | filters.AUDIO | filters.Document.ALL) & filters.Caption(True)
     group_filter = (filters.TEXT | media_with_caption) & (~filters.COMMAND) & (~filters.ChatType.PRIVATE)
-    app.add_handler(MessageHandler(group_filter, handle_group_message))
+    # block=False: каждое сообщение проверяется в своей задаче, и PTB сразу берёт следующее обновление —
+    # иначе пакеты SpamBatcher не набираются, а голосования и меню ждут модель и прогрев
+    app.add_handler(MessageHandler(group_filter, handle_group_message, block=False))
     
     app.add_handler(CallbackQueryHandler(vote_callback, pattern=r'^(spam|ham)\|'))
     app.add_handler(CallbackQueryHandler(content_menu_callback, pattern=r'^cmenu\|'))
@@ -34,8 +71,13 @@ def main():
     app.add_handler(CallbackQueryHandler(content_menu_callback, pattern=r'^tp\|'))
     app.add_handler(CallbackQueryHandler(spam_exceptions_callback, pattern=r'^exceptions\|'))
     
+    if METRICS_PORT:
+        metrics.instrument_handlers(app)
+
     job_queue = app.job_queue
     job_queue.run_repeating(check_and_send_scheduled_content, interval=60, first=10)
+    if MODEL_RELOAD_INTERVAL > 0:
+        job_queue.run_repeating(check_model_update, interval=MODEL_RELOAD_INTERVAL, first=MODEL_RELOAD_INTERVAL)
     
     print('Бот запущен!')
     app.run_polling()
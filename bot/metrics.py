@@ -0,0 +1,210 @@
+"""
+Метрики бота в текстовом формате Prometheus без внешних зависимостей.
+Сервер включается переменной METRICS_PORT и слушает METRICS_HOST
+(по умолчанию только localhost): GET /metrics.
+"""
+import asyncio
+import bisect
+import functools
+import logging
+import time
+
+from telegram.ext import ConversationHandler
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_labels(self.labels, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # значения меток -> [счётчики корзин, сумма, количество]
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def totals(self):
+        """Значения меток -> (количество, сумма)"""
+        return {key: (count, total) for key, (_, total, count) in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {count}')
+        return lines
+
+
+class CallbackMetric:
+    """Значение читается при каждом запросе /metrics: func() -> число или {значения меток: число}"""
+
+    def __init__(self, name, help_text, kind, func, labels=()):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.func = func
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.warning(f"Метрика {self.name} не посчитана: {e}")
+            return lines
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f'{self.name}{_labels(self.labels, key)} {v}')
+        else:
+            lines.append(f'{self.name} {value}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_callback(self, name, help_text, kind, func, labels=()):
+        return self.register(CallbackMetric(name, help_text, kind, func, labels))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+updates_total = registry.register(Counter(
+    'spam_bot_updates_total', 'Обработанные обновления по обработчикам', ['handler']))
+handler_errors_total = registry.register(Counter(
+    'spam_bot_handler_errors_total', 'Исключения в обработчиках', ['handler']))
+check_spam_seconds = registry.register(Histogram(
+    'spam_bot_check_spam_seconds', 'Время check_spam по пути получения вердикта', ['path']))
+verdicts_total = registry.register(Counter(
+    'spam_bot_verdicts_total', 'Вердикты проверки спама по режиму чата', ['mode', 'verdict']))
+second_stage_total = registry.register(Counter(
+    'spam_bot_second_stage_total', 'Проверки второй моделью: agree, to_spam, to_ham, error', ['outcome']))
+second_stage_seconds = registry.register(Histogram(
+    'spam_bot_second_stage_seconds', 'Время ответа второй модели'))
+scheduler_tick_seconds = registry.register(Histogram(
+    'spam_bot_scheduler_tick_seconds', 'Длительность проверки расписания рассылок'))
+loop_lag_seconds = registry.register(Histogram(
+    'spam_bot_event_loop_lag_seconds', 'Задержка event loop относительно запланированного пробуждения'))
+
+
+def _counted(name, callback):
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        updates_total.inc(name)
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            handler_errors_total.inc(name)
+            raise
+    return wrapper
+
+
+def _instrument(handler):
+    if isinstance(handler, ConversationHandler):
+        for h in handler.entry_points + handler.fallbacks:
+            _instrument(h)
+        for handlers in handler.states.values():
+            for h in handlers:
+                _instrument(h)
+    elif hasattr(handler, 'callback'):
+        handler.callback = _counted(getattr(handler.callback, '__name__', 'unknown'), handler.callback)
+
+
+def instrument_handlers(app):
+    """Оборачивает колбэки всех обработчиков приложения счётчиком обновлений"""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            _instrument(handler)
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Фоновая задача: насколько позже запланированного просыпается event loop"""
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        loop_lag_seconds.observe(max(0.0, time.monotonic() - start - interval))
+
+
+async def _handle(reader, writer):
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        parts = request.decode('latin-1').split()
+        # заголовки запроса не нужны, но их надо дочитать
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+            pass
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', registry.render().encode('utf-8')
+        else:
+            status, body = '404 Not Found', b'not found\n'
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host, port):
+    """Запускает HTTP-сервер /metrics"""
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info(f"Метрики Prometheus: http://{host}:{port}/metrics")
+    return server
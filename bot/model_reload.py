@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+
+import classifier
+
+logger = logging.getLogger(__name__)
+
+
+class ModelReloader:
+    """
+    Подмена модели без перезапуска бота.
+    check() раз в интервал сравнивает отпечаток файлов модели (mtime и
+    размер); если файлы изменились и не меняются между двумя проверками,
+    новая модель загружается и проверяется в фоне, затем атомарно
+    подменяет старую. Модель, не прошедшая проверку, отклоняется.
+    on_swap — корутина, которая вызывается после каждой подмены.
+    """
+
+    def __init__(self, executor, on_swap=None):
+        self.executor = executor
+        self.on_swap = on_swap
+        self.version = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self._seen = None
+        self._pending = None
+        self._lock = asyncio.Lock()
+
+    def mark_loaded(self, fingerprint, version):
+        """Запоминает отпечаток файлов и версию текущей модели"""
+        self._seen = fingerprint
+        self.version = version
+
+    async def check(self):
+        """Перезагружает модель, если её файлы изменились"""
+        fingerprint = classifier.artifact_fingerprint()
+        if fingerprint == self._seen or self._lock.locked():
+            self._pending = None
+            return False
+        if fingerprint != self._pending:
+            # файлы могут ещё дописываться — ждём следующей проверки
+            self._pending = fingerprint
+            return False
+        self._pending = None
+        return await self.reload()
+
+    async def reload(self):
+        """Загружает, проверяет и подменяет модель; False, если подмена отклонена"""
+        async with self._lock:
+            fingerprint = classifier.artifact_fingerprint()
+            start = time.monotonic()
+            try:
+                if self.executor.workers > 0:
+                    version = await self.executor.replace_pool()
+                else:
+                    loop = asyncio.get_running_loop()
+                    # чтение файлов — в потоке, проверка на паре сообщений — здесь же, в event loop
+                    sm = await loop.run_in_executor(None, classifier.build_model)
+                    classifier.install_model(classifier.validate_model(sm))
+                    version = sm.version
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                # эти файлы больше не пробуем, пока они снова не изменятся
+                self._seen = fingerprint
+                logger.error(f"Новая модель отклонена, остаётся {self.version}: {e}")
+                return False
+            self._seen = fingerprint
+            self.version = version
+            self.reloads += 1
+            self.last_error = None
+            if self.on_swap is not None:
+                await self.on_swap()
+            logger.info(f"Модель заменена на {version} за {time.monotonic() - start:.2f} с")
+            return True
+
+    def get_stats(self) -> dict:
+        return {
+            'version': self.version,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,129 @@
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class NearDuplicateIndex:
+    """
+    Индекс недавно подтверждённого спама для поиска почти-дубликатов.
+    Текст (слова preprocessing.tokenize через пробел) разбивается на
+    символьные шинглы, по ним считается MinHash-подпись, кандидаты ищутся
+    через LSH по полосам подписи. Подписи лежат в заранее выделенной матрице на max_entries
+    строк, при переполнении вытесняются самые старые; записи старше
+    max_age секунд удаляются.
+    """
+
+    def __init__(self, threshold: float = 0.7, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 5, min_length: int = 20, max_length: int = 500,
+                 max_entries: int = 10000, max_age: float = 86400, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._signatures = np.zeros((max_entries, num_perm), dtype=np.uint64)
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._entries = OrderedDict()  # слот -> (added_at, band_keys)
+        self._buckets = [{} for _ in range(bands)]
+        self.queries = 0
+        self.hits = 0
+
+    def signature(self, cleaned: str):
+        """MinHash-подпись текста или None, если текст слишком короткий"""
+        if len(cleaned) < self.min_length:
+            return None
+        # у длинных сообщений хватает начала текста, а время подписи остаётся ограниченным
+        cleaned = cleaned[:self.max_length]
+        k = self.shingle_size
+        n = len(cleaned) - k + 1
+        # UTF-32: каждый символ занимает 4 байта, шингл — срез фиксированной длины
+        data = cleaned.encode('utf-32-le')
+        hashes = np.fromiter((zlib.crc32(data[4 * i:4 * (i + k)]) for i in range(n)), dtype=np.uint64, count=n)
+        values = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME
+        return (values & _MAX_HASH).min(axis=0)
+
+    def _band_keys(self, sig):
+        r = self.rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def add(self, cleaned: str) -> bool:
+        """Добавляет подтверждённый спам; False, если текст слишком короткий"""
+        sig = self.signature(cleaned)
+        if sig is None:
+            return False
+        now = time.monotonic()
+        self._prune(now)
+        if not self._free:
+            self._remove(next(iter(self._entries)))
+        slot = self._free.pop()
+        self._signatures[slot] = sig
+        keys = self._band_keys(sig)
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, set()).add(slot)
+        self._entries[slot] = (now, keys)
+        return True
+
+    def query(self, cleaned: str):
+        """Оценка сходства Жаккара с ближайшим спамом из индекса или None"""
+        self.queries += 1
+        if not self._entries:
+            return None
+        sig = self.signature(cleaned)
+        if sig is None:
+            return None
+        self._prune(time.monotonic())
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            ids = bucket.get(key)
+            if ids:
+                candidates.update(ids)
+        if not candidates:
+            return None
+        slots = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+        best = float((self._signatures[slots] == sig).mean(axis=1).max())
+        if best >= self.threshold:
+            self.hits += 1
+            return best
+        return None
+
+    def _remove(self, slot):
+        _, keys = self._entries.pop(slot)
+        for bucket, key in zip(self._buckets, keys):
+            slots = bucket.get(key)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del bucket[key]
+        self._free.append(slot)
+
+    def _prune(self, now):
+        deadline = now - self.max_age
+        while self._entries:
+            oldest, (added_at, _) = next(iter(self._entries.items()))
+            if added_at >= deadline:
+                break
+            self._remove(oldest)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'queries': self.queries,
+            'hits': self.hits,
+        }
@@ -0,0 +1,85 @@
+import re
+import time
+
+from classifier import detect_single_chars_spam
+
+HAM = (False, 0.0)
+# clean_text оставляет только русские буквы (и пробелы): без них очищенный текст пуст
+_CYRILLIC_RE = re.compile(r'[а-яёА-ЯЁ]')
+
+
+class RuleCascade:
+    """
+    Правила перед моделью: дешёвые проверки по порядку, первая сработавшая
+    даёт вердикт, и до модели сообщение не доходит. Остальные сообщения
+    (check вернул None) проверяются как обычно.
+
+        single_chars — много одиночных символов: спам (та же эвристика, что в
+                       score_batch, но без обращения к пулу)
+        trusted      — отправитель из trusted_ids: не спам
+        short        — сообщение не длиннее short_max_chars символов: не спам
+        empty        — нет ни одной русской буквы, clean_text вернёт пустую строку:
+                       вердикт модели для '' (empty_verdict). Его выставляет бот
+                       после загрузки модели; пока его нет, правило пропускает
+
+    trusted и short решают за модель, поэтому по умолчанию выключены;
+    empty повторяет её собственный вердикт. Если какое-то правило
+    включено, single_chars проверяется первым: иначе 'h e l l o w o r l d'
+    прошёл бы как короткий или нерусский текст.
+    """
+
+    def __init__(self, rules, short_max_chars=12, trusted_ids=()):
+        rules = [name for name in rules if name]
+        if rules:
+            rules = ['single_chars'] + [name for name in rules if name != 'single_chars']
+        self.rules = rules
+        unknown = [name for name in self.rules if not hasattr(self, f'_rule_{name}')]
+        if unknown:
+            raise ValueError(f"Неизвестные правила: {', '.join(unknown)}")
+        self._checks = [(name, getattr(self, f'_rule_{name}')) for name in self.rules]
+        self.short_max_chars = short_max_chars
+        self.trusted_ids = set(trusted_ids)
+        self.empty_verdict = None
+        self.seen = 0
+        self.settled = {name: 0 for name in self.rules}
+        self.total_ns = 0
+
+    def _rule_trusted(self, text, user_id):
+        return HAM if user_id is not None and user_id in self.trusted_ids else None
+
+    def _rule_single_chars(self, text, user_id):
+        return (True, 0.95) if detect_single_chars_spam(text) else None
+
+    def _rule_empty(self, text, user_id):
+        if self.empty_verdict is None or _CYRILLIC_RE.search(text):
+            return None
+        return self.empty_verdict
+
+    def _rule_short(self, text, user_id):
+        return HAM if len(text.strip()) <= self.short_max_chars else None
+
+    def check(self, text, user_id=None):
+        """(вердикт, имя правила) или (None, None), если правила не решили"""
+        if not self._checks:
+            return None, None
+        start = time.perf_counter_ns()
+        self.seen += 1
+        try:
+            for name, rule in self._checks:
+                verdict = rule(text, user_id)
+                if verdict is not None:
+                    self.settled[name] += 1
+                    return verdict, name
+            return None, None
+        finally:
+            self.total_ns += time.perf_counter_ns() - start
+
+    def get_stats(self) -> dict:
+        settled = sum(self.settled.values())
+        return {
+            'seen': self.seen,
+            'settled': dict(self.settled),
+            'settled_share': settled / self.seen if self.seen else 0.0,
+            'shares': {name: n / self.seen if self.seen else 0.0 for name, n in self.settled.items()},
+            'avg_us': self.total_ns / self.seen / 1000 if self.seen else 0.0,
+        }
@@ -2,6 +2,7 @@ import os
 import json
 import logging
 from datetime import datetime, time
+from time import perf_counter
 from typing import Dict, List, Optional, Union
 from config import NOVOSIBIRSK_TZ
 
@@ -9,6 +10,7 @@ from telegram import Bot, InputFile
 from telegram.error import TelegramError
 
 from utils import get_novosibirsk_time
+from metrics import scheduler_tick_seconds
 from storage import known_chats
 
 logger = logging.getLogger(__name__)
@@ -27,6 +29,9 @@ class ContentScheduler:
         self.subscribers = self._load_subscribers()
         self.scheduled_content = self._load_scheduled_content()
         self.schedule = self._load_schedule()
+        # счётчики отправок с момента запуска (для метрик)
+        self.sent_total = 0
+        self.failed_total = 0
     
     def _load_subscribers(self) -> Dict[int, Dict]:
         """Загружает список подписчиков из файла"""
@@ -320,7 +325,7 @@ class ContentScheduler:
                 failed += 1
                 logger.error(f"Ошибка отправки контента {content_id} пользователю {user_id}: {e}")
         
-        return {"sent": sent, "failed": failed}
+        return self._count_sent(sent, failed)
 
     async def send_content_by_schedule(self, bot: Bot, schedule: Dict, known_chats: Dict[int, str]) -> Dict[str,int]:
         """Отправляет контент согласно настройкам аудитории в расписании."""
@@ -370,6 +375,11 @@ class ContentScheduler:
                 except Exception:
                     failed += 1
 
+        return self._count_sent(sent, failed)
+
+    def _count_sent(self, sent: int, failed: int) -> Dict[str, int]:
+        self.sent_total += sent
+        self.failed_total += failed
         return {"sent": sent, "failed": failed}
 
     async def _send_to_chat(self, bot: Bot, chat_id: int, content: Dict):
@@ -469,6 +479,7 @@ content_scheduler = ContentScheduler()
 
 async def check_and_send_scheduled_content(context):
     """Проверяет расписание и отправляет контент если наступило время"""
+    start = perf_counter()
     try:
         schedules = content_scheduler.get_all_schedules()
         for schedule_id, schedule in schedules.items():
@@ -484,4 +495,6 @@ async def check_and_send_scheduled_content(context):
                     logging.info(f"Расписание {schedule_id} удалено (одноразовая рассылка)")
                     
     except Exception as e:
-        logging.error(f"Ошибка в планировщике рассылки: {e}")
\ No newline at end of file
+        logging.error(f"Ошибка в планировщике рассылки: {e}")
+    finally:
+        scheduler_tick_seconds.observe(perf_counter() - start)
\ No newline at end of file
@@ -0,0 +1,110 @@
+import time
+
+# 4 корзины на каждое удвоение времени: от 128 нс до ~34 с, погрешность перцентиля до 25%
+_MIN_BITS = 8
+_MAX_BITS = 35
+_SUBBUCKETS = 4
+_NUM_BUCKETS = (_MAX_BITS - _MIN_BITS + 1) * _SUBBUCKETS
+
+
+def _bucket(ns):
+    bits = ns.bit_length()
+    if bits < _MIN_BITS:
+        return 0
+    if bits > _MAX_BITS:
+        return _NUM_BUCKETS - 1
+    # старшие три бита: 1xy, xy — номер четверти внутри удвоения
+    return (bits - _MIN_BITS) * _SUBBUCKETS + ((ns >> (bits - 3)) & 3)
+
+
+def _bucket_upper_ns(index):
+    bits = index // _SUBBUCKETS + _MIN_BITS
+    return (5 + index % _SUBBUCKETS) << (bits - 3)
+
+
+class Histogram:
+    """Гистограмма длительностей с логарифмическими корзинами фиксированного размера"""
+
+    __slots__ = ('counts', 'count', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.counts[_bucket(ns)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попадает q-й перцентиль (нс)"""
+        if not self.count:
+            return 0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(_bucket_upper_ns(index), self.max_ns)
+        return self.max_ns
+
+
+class StageTimings:
+    """
+    Время этапов проверки спама. На каждый этап — одна гистограмма
+    постоянного размера; запись замера — несколько целочисленных операций.
+    Воркеры пула отдают накопленное через drain(), основной процесс
+    складывает его через merge().
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.histograms = {stage: Histogram() for stage in self.stages}
+        self.started_at = time.monotonic()
+
+    def record(self, stage, ns):
+        self.histograms[stage].add(ns)
+
+    def drain(self):
+        """Снимок ненулевых данных с обнулением (для передачи из воркера)"""
+        snapshot = {}
+        for stage, h in self.histograms.items():
+            if h.count:
+                counts = {i: n for i, n in enumerate(h.counts) if n}
+                snapshot[stage] = (counts, h.count, h.total_ns, h.max_ns)
+                self.histograms[stage] = Histogram()
+        return snapshot
+
+    def merge(self, snapshot):
+        for stage, (counts, count, total_ns, max_ns) in snapshot.items():
+            h = self.histograms.get(stage)
+            if h is None:
+                continue
+            for i, n in counts.items():
+                h.counts[i] += n
+            h.count += count
+            h.total_ns += total_ns
+            h.max_ns = max(h.max_ns, max_ns)
+
+    def reset(self):
+        self.histograms = {stage: Histogram() for stage in self.stages}
+        self.started_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        """Этап -> число замеров, среднее, p50/p95/p99 и максимум в микросекундах"""
+        stats = {}
+        for stage in self.stages:
+            h = self.histograms[stage]
+            stats[stage] = {
+                'count': h.count,
+                'mean_us': h.total_ns / h.count / 1000 if h.count else 0.0,
+                'p50_us': h.percentile(50) / 1000,
+                'p95_us': h.percentile(95) / 1000,
+                'p99_us': h.percentile(99) / 1000,
+                'max_us': h.max_ns / 1000,
+            }
+        return stats
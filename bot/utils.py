@@ -1,20 +1,33 @@
+import asyncio
 import logging
-import sys
+import time
 import csv
 import os
-import joblib
-import pandas as pd
-import numpy as np
 from storage import spam_exceptions
 from datetime import datetime
-from scipy.sparse import hstack
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-sys.path.append(project_root)
-from src import utils as src_utils, preprocessing as p
-from config import NOVOSIBIRSK_TZ, ADMIN_IDS, VOTE_LOG_PATH
+from config import (
+    NOVOSIBIRSK_TZ, ADMIN_IDS, VOTE_LOG_PATH, SPAM_BATCH_WINDOW_MS, SPAM_BATCH_MAX_SIZE,
+    INFERENCE_WORKERS, VERDICT_CACHE_TTL, VERDICT_CACHE_MAX_BYTES,
+    NEAR_DUP_ENABLED, NEAR_DUP_THRESHOLD, NEAR_DUP_MAX_ENTRIES, NEAR_DUP_MAX_AGE, WARMUP_MAX_WAIT,
+    SPAM_STAGE_TIMING, PREFILTER_RULES, PREFILTER_SHORT_MAX_CHARS, PREFILTER_TRUSTED_IDS,
+    SECOND_STAGE_ENABLED, SECOND_STAGE_LOW, SECOND_STAGE_HIGH, LEMMA_TABLE
+)
 from storage import known_chats
+from batching import SpamBatcher
+from classifier import (
+    detect_single_chars_spam, score_batch, get_model, preload_lemma_cache, artifact_fingerprint, SAMPLE_TEXTS,
+    stage_timings
+)
+from inference import InferenceExecutor
+from verdict_cache import VerdictCache
+from near_duplicates import NearDuplicateIndex
+from warmup import WarmUp
+from model_reload import ModelReloader
+from metrics import check_spam_seconds, second_stage_total, second_stage_seconds
+from prefilter import RuleCascade
+from src import preprocessing as p
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +86,11 @@ def get_novosibirsk_time():
     return datetime.now(NOVOSIBIRSK_TZ)
 
 def log_vote_result(text, label, user_id=None):
+    if text:
+        # решение админов заменяет вердикт модели для повторов того же текста
+        verdict_cache.put(text, (label == 'spam', 1.0 if label == 'spam' else 0.0))
+    if label == 'spam' and text:
+        remember_spam(text)
     file_exists = os.path.isfile(VOTE_LOG_PATH)
     with open(VOTE_LOG_PATH, 'a', encoding='utf-8', newline='') as f:
         writer = csv.writer(f)
@@ -84,60 +102,224 @@ def is_admin(user_id: int) -> bool:
     """Проверяет, является ли пользователь администратором"""
     return user_id in ADMIN_IDS
 
-def detect_single_chars_spam(text, threshold=0.5):
-    """
-    Обнаружение сообщений с большим количеством одиночных символов
-    threshold - порог (если доля одиночных символов > threshold, считаем спамом)
-    """
-    if not text or len(text.strip()) < 10:
-        return False
-    
-    words = text.split()
-    if len(words) < 3:
-        return False
-    
-    import re
-    single_chars = 0
-    for word in words:
-        clean_word = re.sub(r'[^\w]', '', word)
-        if len(clean_word) == 1 and clean_word.isalnum():
-            single_chars += 1
-    
-    ratio = single_chars / len(words)
-    
-    return ratio > threshold
+async def _score_and_cache(texts):
+    """Проверяет тексты моделью и запоминает вердикты"""
+    results = await inference_executor.score(texts)
+    for text, verdict in zip(texts, results):
+        verdict_cache.put(text, verdict)
+    return results
 
+def _near_dup_text(text):
+    # только регулярные выражения tokenize(), без pymorphy2: подпись считается в event loop
+    return ' '.join(p.tokenize(text))
 
-# загрузка модели и векторайзера
-ps = src_utils.get_paths()
-m = joblib.load(ps['model'])
-v = joblib.load(ps['vectorizer'])
+def remember_spam(text):
+    """Добавляет подтверждённый спам в индекс почти-дубликатов"""
+    if NEAR_DUP_ENABLED:
+        near_duplicates.add(_near_dup_text(text))
 
-async def check_spam(text):
-    """Проверка текста на спам"""
-    if detect_single_chars_spam(text):
-        return True, 0.95
+def _fast_verdict(text):
+    """Вердикт без модели и его источник: кэш точных совпадений, затем индекс почти-дубликатов"""
+    cached = verdict_cache.get(text)
+    if cached is not None:
+        return cached, 'cache'
+    # сходство в вердикт не попадает: вероятность 1.0, как у решения админов
+    if NEAR_DUP_ENABLED and len(near_duplicates) and near_duplicates.query(_near_dup_text(text)) is not None:
+        return (True, 1.0), 'near_dup'
+    return None, None
 
-    x = p.clean_text(text)
-    d = pd.DataFrame({'text': [x]})
-    f = p.extract_features(d.copy())
-    X = v.transform(f['text'])
-    add = f[[c for c in f.columns if c != 'text']].values
-    
+async def check_spam_batch(texts):
+    """Проверка списка текстов на спам за один вызов модели"""
+    texts = list(texts)
+    results = [prefilter.check(t)[0] or _fast_verdict(t)[0] for t in texts]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        scored = await _score_and_cache([texts[i] for i in missing])
+        for i, verdict in zip(missing, scored):
+            results[i] = verdict
+    return results
+
+def _warm_up_inline():
+    version = get_model().version
+    preload_lemma_cache()
+    score_batch(SAMPLE_TEXTS)
+    return version
+
+async def warm_up():
+    """Загружает модель и прогоняет тестовые сообщения через весь пайплайн"""
+    fingerprint = artifact_fingerprint()
+    if INFERENCE_WORKERS > 0:
+        # пул запускается, и каждый процесс проверяет модель на тестовых сообщениях
+        version = await inference_executor.replace_pool()
+    else:
+        version = await asyncio.get_running_loop().run_in_executor(None, _warm_up_inline)
+    model_reloader.mark_loaded(fingerprint, version)
+    await _score_empty()
+
+async def _score_empty():
+    """Вердикт модели для пустого clean_text — его правило empty отдаёт текстам без русских букв"""
+    prefilter.empty_verdict = None
     try:
-        expected_total = m.coef_.shape[1]
-        expected_add = expected_total - X.shape[1]
-        current_add = add.shape[1]
-        if current_add < expected_add:
-            pad = np.zeros((add.shape[0], expected_add - current_add), dtype=add.dtype)
-            add = np.hstack([add, pad])
-        elif current_add > expected_add:
-            add = add[:, :expected_add]
-    except Exception:
-        pass
-    
-    Xf = hstack([X, add])
-    pr = m.predict(Xf)[0]
-    proba = m.predict_proba(Xf)[0]
-    cl = list(m.classes_)
-    return pr == 'spam', proba[cl.index('spam')]
\ No newline at end of file
+        prefilter.empty_verdict = (await inference_executor.score(['']))[0]
+    except Exception as e:
+        logger.warning(f"Не удалось проверить пустой текст, правило empty пропускает сообщения: {e}")
+
+async def check_model_update(context):
+    """Задача job_queue: подхватывает переобученную модель (и исправленную после неудачного прогрева)"""
+    if warmup.ready or warmup.failed:
+        await model_reloader.check()
+
+async def _on_model_swap():
+    # вердикты старой модели больше не действительны
+    verdict_cache.invalidate()
+    warmup.mark_ready()
+    await _score_empty()
+
+async def check_spam(text, user_id=None):
+    """Проверка текста на спам (правила, кэш, почти-дубликаты, затем пакетная проверка моделью)"""
+    start = time.perf_counter()
+    verdict, rule = prefilter.check(text, user_id)
+    if verdict is not None:
+        path = f'rule_{rule}'
+    elif not await warmup.wait():
+        # модель ещё грузится — только эвристика, вердикт не кэшируется
+        verdict, path = ((True, 0.95) if detect_single_chars_spam(text) else (False, 0.0)), 'heuristic'
+    else:
+        verdict, path = _fast_verdict(text)
+        if verdict is None:
+            verdict, path = await spam_batcher.check(text), 'model'
+    check_spam_seconds.observe(time.perf_counter() - start, path)
+    return verdict
+
+def needs_second_opinion(prob):
+    """Вероятность в полосе неуверенности — решение за второй моделью"""
+    return SECOND_STAGE_ENABLED and SECOND_STAGE_LOW <= prob <= SECOND_STAGE_HIGH
+
+async def second_opinion(text, first_is_spam):
+    """(is_spam, prob) второй модели или None, если она недоступна"""
+    start = time.perf_counter()
+    try:
+        prob = (await inference_executor.score_second_stage([text]))[0]
+    except Exception as e:
+        logger.warning(f"Вторая модель не ответила, остаётся вердикт основной: {e}")
+        second_stage_total.inc('error')
+        return None
+    second_stage_seconds.observe(time.perf_counter() - start)
+    verdict = (prob > 0.5, prob)
+    if verdict[0] == first_is_spam:
+        second_stage_total.inc('agree')
+    else:
+        second_stage_total.inc('to_spam' if verdict[0] else 'to_ham')
+    # повтор того же текста получит уже окончательный вердикт
+    verdict_cache.put(text, verdict)
+    return verdict
+
+def get_spam_stats_text() -> str:
+    """Форматирует статистику проверки спама для админов"""
+    cache = verdict_cache.get_stats()
+    batches = spam_batcher.get_stats()
+    dups = near_duplicates.get_stats()
+    lemmas = inference_executor.lemma_cache_stats()
+    reloads = model_reloader.get_stats()
+    rules = prefilter.get_stats()
+    latency = check_spam_seconds.totals()
+    checks = sum(count for count, _ in latency.values())
+    avg_ms = sum(total for _, total in latency.values()) / checks * 1000 if checks else 0.0
+    model_count, model_total = latency.get(('model',), (0, 0.0))
+    model_ms = model_total / model_count * 1000 if model_count else 0.0
+    settled = ', '.join(f'{name} {share:.0%}' for name, share in rules['shares'].items()) or 'правила выключены'
+    if warmup.ready:
+        readiness = f'готова через {warmup.ready_after:.1f} с после старта'
+    else:
+        readiness = 'ошибка прогрева, только эвристика' if warmup.failed else 'идёт прогрев'
+    error = f'• Последняя ошибка: {reloads["last_error"][:200]}\n' if reloads['last_error'] else ''
+    if LEMMA_TABLE:
+        lemma_cache = 'Кэш лемм: не используется (LEMMA_TABLE=1)'
+    else:
+        lemma_cache = (
+            'Кэш лемм pymorphy2:\n'
+            f'• Записей: {lemmas["size"]} из {lemmas["max_size"]}\n'
+            f'• Попаданий: {lemmas["hits"]} из {lemmas["hits"] + lemmas["misses"]} ({lemmas["hit_rate"]:.1%}), '
+            f'вытеснено: {lemmas["evictions"]}'
+        )
+    second = ''
+    if SECOND_STAGE_ENABLED:
+        second_count, second_total = second_stage_seconds.totals().get((), (0, 0.0))
+        second_ms = second_total / second_count * 1000 if second_count else 0.0
+        second = (
+            f'Вторая модель (полоса {SECOND_STAGE_LOW:.2f}–{SECOND_STAGE_HIGH:.2f}):\n'
+            f'• Проверено: {second_count}, в среднем {second_ms:.1f} мс\n'
+            f'• Согласна: {second_stage_total.value("agree")}, '
+            f'изменила на спам: {second_stage_total.value("to_spam")}, '
+            f'на не спам: {second_stage_total.value("to_ham")}, ошибок: {second_stage_total.value("error")}\n\n'
+        )
+    return (
+        '🧪 Проверка спама\n\n'
+        f'Модель: {readiness}\n'
+        f'• Ждали прогрева: {warmup.queued}, проверено эвристикой: {warmup.timed_out}\n'
+        f'• Версия: {reloads["version"] or "—"}, перезагрузок: {reloads["reloads"]}, '
+        f'отклонено: {reloads["failures"]}\n'
+        f'{error}\n'
+        'Правила до модели:\n'
+        f'• Решено: {rules["settled_share"]:.0%} из {rules["seen"]} ({settled})\n'
+        f'• Правила: {rules["avg_us"]:.0f} мкс, модель: {model_ms:.1f} мс, в среднем на сообщение: {avg_ms:.2f} мс\n\n'
+        f'{second}'
+        'Кэш вердиктов:\n'
+        f'• Записей: {cache["entries"]} ({cache["bytes"] / 1024:.1f} из {cache["max_bytes"] / 1024:.0f} КБ)\n'
+        f'• Попаданий: {cache["hits"]} из {cache["hits"] + cache["misses"]} ({cache["hit_rate"]:.1%})\n'
+        f'• Вытеснено: {cache["evictions"]}, сбросов: {cache["invalidations"]}\n\n'
+        'Пакетная проверка:\n'
+        f'• Пакетов: {batches["batches"]}, сообщений: {batches["messages"]}\n'
+        f'• Средний размер: {batches["avg_batch"]:.1f}, максимальный: {batches["max_batch"]}\n\n'
+        'Почти-дубликаты спама:\n'
+        f'• В индексе: {dups["entries"]} из {dups["max_entries"]}\n'
+        f'• Найдено: {dups["hits"]} из {dups["queries"]} проверок\n\n'
+        f'{lemma_cache}'
+    )
+
+STAGE_TITLES = {
+    'single_chars': 'одиночные символы',
+    'tokenize': 'регулярки clean_text',
+    'lemmatize': 'лемматизация',
+    'features': 'доп. признаки',
+    'transform': 'v.transform',
+    'padding': 'выравнивание столбцов',
+    'model': 'модель',
+    'total': 'всего',
+}
+
+def get_stage_stats_text() -> str:
+    """Перцентили времени этапов проверки спама (мкс на пакет)"""
+    if not SPAM_STAGE_TIMING:
+        return '⏱ Замеры этапов выключены (SPAM_STAGE_TIMING=0).'
+    stats = stage_timings.get_stats()
+    total = stats['total']
+    if not total['count']:
+        return '⏱ Этапы проверки спама\n\nЗамеров пока нет.'
+    minutes = (time.monotonic() - stage_timings.started_at) / 60
+    lines = [
+        '⏱ Этапы проверки спама',
+        f'Пакетов: {total["count"]} за {minutes:.0f} мин, время в мкс на пакет',
+        'этап: p50 / p95 / p99 (макс), доля',
+        '',
+    ]
+    for stage, title in STAGE_TITLES.items():
+        st = stats[stage]
+        if not st['count']:
+            continue
+        share = st['mean_us'] / total['mean_us'] if total['mean_us'] else 0.0
+        lines.append(
+            f'• {title}: {st["p50_us"]:.0f} / {st["p95_us"]:.0f} / {st["p99_us"]:.0f} '
+            f'({st["max_us"]:.0f}), {share:.0%}'
+        )
+    return '\n'.join(lines)
+
+verdict_cache = VerdictCache(VERDICT_CACHE_TTL, VERDICT_CACHE_MAX_BYTES)
+near_duplicates = NearDuplicateIndex(
+    threshold=NEAR_DUP_THRESHOLD, max_entries=NEAR_DUP_MAX_ENTRIES, max_age=NEAR_DUP_MAX_AGE
+)
+inference_executor = InferenceExecutor(INFERENCE_WORKERS)
+warmup = WarmUp(WARMUP_MAX_WAIT)
+model_reloader = ModelReloader(inference_executor, _on_model_swap)
+prefilter = RuleCascade(PREFILTER_RULES, PREFILTER_SHORT_MAX_CHARS, ADMIN_IDS + PREFILTER_TRUSTED_IDS)
+spam_batcher = SpamBatcher(_score_and_cache, SPAM_BATCH_WINDOW_MS / 1000, SPAM_BATCH_MAX_SIZE)
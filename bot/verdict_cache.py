@@ -0,0 +1,87 @@
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация для ключа кэша: регистр и пробелы не влияют на вердикт"""
+    return ' '.join(text.split()).lower()
+
+
+class VerdictCache:
+    """
+    Кэш вердиктов (is_spam, prob) по хэшу нормализованного текста.
+    Записи живут ttl секунд, общий объём ограничен max_bytes
+    (самые старые записи вытесняются). После перезагрузки модели
+    кэш нужно сбросить через invalidate().
+    """
+
+    def __init__(self, ttl: float = 900, max_bytes: int = 8 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, is_spam, prob)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        sample_key = self._key('')
+        # примерный размер одной записи: ключ, кортеж значения, два float и узел OrderedDict
+        self._entry_bytes = (
+            sys.getsizeof(sample_key) + sys.getsizeof((0.0, True, 0.0)) + 2 * sys.getsizeof(0.0) + 100
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).digest()
+
+    def get(self, text: str):
+        """Возвращает (is_spam, prob) или None"""
+        if not self.enabled:
+            return None
+        key = self._key(text)
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, text: str, verdict):
+        if not self.enabled:
+            return
+        key = self._key(text)
+        self._data[key] = (time.monotonic() + self.ttl, verdict[0], verdict[1])
+        self._data.move_to_end(key)
+        max_entries = max(1, self.max_bytes // self._entry_bytes)
+        while len(self._data) > max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self):
+        """Сбрасывает все вердикты (после смены модели)"""
+        self._data.clear()
+        self.invalidations += 1
+
+    def bytes_used(self) -> int:
+        return len(self._data) * self._entry_bytes
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'bytes': self.bytes_used(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
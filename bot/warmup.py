@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """
+    Готовность проверки спама после старта бота.
+    Прогрев (загрузка модели, словарей pymorphy2 и тестовые сообщения)
+    идёт фоновой задачей, пока бот уже принимает обновления. Сообщения,
+    пришедшие раньше, ждут готовности не дольше max_wait секунд.
+    """
+
+    def __init__(self, max_wait: float = 10):
+        self.max_wait = max_wait
+        self.ready_after = None
+        self.failed = False
+        self.queued = 0
+        self.timed_out = 0
+        self._started = time.monotonic()
+        self._event = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._event.is_set()
+
+    async def run(self, warm_func):
+        """Выполняет warm_func (корутину) и отмечает готовность"""
+        self._started = time.monotonic()
+        try:
+            await warm_func()
+        except Exception as e:
+            self.failed = True
+            logger.exception(f"Прогрев модели не удался, спам проверяется только эвристикой: {e}")
+            return
+        self.mark_ready()
+
+    def mark_ready(self):
+        """
+        Отмечает готовность. Вызывается и после прогрева, и после успешной
+        подмены модели: так бот выходит из режима эвристики, если прогрев
+        не удался, а исправленную модель подхватил ModelReloader
+        """
+        if self.ready:
+            return
+        self.failed = False
+        self.ready_after = time.monotonic() - self._started
+        self._event.set()
+        logger.info(
+            f"Проверка спама готова через {self.ready_after:.2f} с после старта бота "
+            f"(ждали в очереди: {self.queued}, проверено эвристикой: {self.timed_out})"
+        )
+
+    async def wait(self) -> bool:
+        """Ждёт готовности до max_wait секунд; False — модель ещё не готова"""
+        if self.ready:
+            return True
+        if self.failed or self.max_wait <= 0:
+            self.timed_out += 1
+            return False
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._event.wait(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return False
+        return True
@@ -3,15 +3,22 @@ from src import utils
 
 paths = utils.get_paths()
 
-ham_df = pd.read_csv(paths['ham'], header=None, names=['text'])
-spam_df = pd.read_csv(paths['spam'], header=None, names=['text'])
 
-ham_df['label'] = 'ham'
-spam_df['label'] = 'spam'
+def combine_data():
+    ham_df = pd.read_csv(paths['ham'], header=None, names=['text'])
+    spam_df = pd.read_csv(paths['spam'], header=None, names=['text'])
 
-combined_df = pd.concat([ham_df, spam_df])
+    ham_df['label'] = 'ham'
+    spam_df['label'] = 'spam'
 
-combined_df.to_csv(paths['combined'], index=False)
-print("Данные объединены и сохранены в", paths['combined'])
-print(f"Всего сообщений: {len(combined_df)}")
-print(f"Ham: {len(ham_df)}, Spam: {len(spam_df)}")
\ No newline at end of file
+    # решения из bot_votes.csv добавляются при разбиении (src/create_test_data.py)
+    combined_df = pd.concat([ham_df, spam_df])
+
+    combined_df.to_csv(paths['combined'], index=False)
+    print("Данные объединены и сохранены в", paths['combined'])
+    print(f"Всего сообщений: {len(combined_df)}")
+    print(f"Ham: {len(ham_df)}, Spam: {len(spam_df)}")
+
+
+if __name__ == '__main__':
+    combine_data()
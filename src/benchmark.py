@@ -0,0 +1,403 @@
+"""
+Микробенчмарки пути классификации.
+
+    python src/benchmark.py scorer [--limit N]
+    python src/benchmark.py features [--limit N]
+    python src/benchmark.py keywords [--limit N] [--sizes 28,100,300,1000]
+    python src/benchmark.py neardup [--limit N] [--sizes 1000,10000,100000]
+    python src/benchmark.py bundle [--limit N]
+    python src/benchmark.py precision
+    python src/benchmark.py streaming [--sizes 1,4,16] [--kinds streaming,memory]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.sparse import hstack
+from sklearn.metrics import precision_score, recall_score
+from sklearn.model_selection import train_test_split
+
+import utils
+import preprocessing
+from scorer import FusedLinearScorer
+
+paths = utils.get_paths()
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot'))
+
+
+def load_corpus(limit=None):
+    """Читает data/combined.csv и возвращает (сырые тексты, очищенные тексты, метки)"""
+    df = pd.read_csv(paths['combined'])
+    if limit:
+        df = df.head(limit)
+    raw = df['text'].astype(str).tolist()
+    cleaned = [preprocessing.clean_text(t) for t in raw]
+    return raw, cleaned, df['label'].tolist()
+
+
+def extra_matrix(cleaned):
+    """Доп. признаки в порядке обучения"""
+    f = preprocessing.extract_features(pd.DataFrame({'text': cleaned}))
+    return f[[c for c in f.columns if c != 'text']].values
+
+
+def timeit(func, items, repeat=3):
+    """Лучшее среднее время одного вызова func(item) в микросекундах"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, (time.perf_counter() - start) / len(items))
+    return best * 1e6
+
+
+def bench_scorer(args):
+    model = joblib.load(paths['model'])
+    vectorizer = joblib.load(paths['vectorizer'])
+    scorer = FusedLinearScorer.from_sklearn(model, vectorizer)
+    spam_col = list(model.classes_).index('spam')
+
+    _, cleaned, _ = load_corpus(args.limit)
+    add = extra_matrix(cleaned)
+
+    expected = model.predict_proba(hstack([vectorizer.transform(cleaned), add]).tocsr())[:, spam_col]
+    fused = scorer.predict_proba_many(cleaned, add)
+    max_diff = float(np.max(np.abs(expected - fused)))
+    print(f"Сообщений: {len(cleaned)}, макс. расхождение с predict_proba: {max_diff:.3e}")
+    if max_diff > 1e-9:
+        raise SystemExit("Свёрнутый скорер расходится с sklearn больше чем на 1e-9")
+
+    items = list(zip(cleaned, add))
+
+    def sklearn_path(item):
+        x, _ = item
+        f = preprocessing.extract_features(pd.DataFrame({'text': [x]}))
+        row = f[[c for c in f.columns if c != 'text']].values
+        model.predict_proba(hstack([vectorizer.transform(f['text']), row]))
+
+    def sklearn_model_only(item):
+        x, row = item
+        model.predict_proba(hstack([vectorizer.transform([x]), row.reshape(1, -1)]))
+
+    def fused_path(item):
+        scorer.predict_proba(*item)
+
+    print("Одно сообщение, мкс (текст уже очищен):")
+    print(f"  sklearn + DataFrame:       {timeit(sklearn_path, items, 1):9.1f}")
+    print(f"  sklearn (transform+hstack): {timeit(sklearn_model_only, items):9.1f}")
+    print(f"  свёрнутый скорер:          {timeit(fused_path, items):9.1f}")
+
+
+def bench_features(args):
+    _, cleaned, _ = load_corpus(args.limit)
+    expected = extra_matrix(cleaned)
+    got = preprocessing.extract_features_matrix(cleaned)
+    if expected.shape != got.shape or not np.array_equal(expected, got):
+        raise SystemExit("extract_features_matrix расходится с extract_features")
+    print(f"Сообщений: {len(cleaned)}, признаков: {got.shape[1]}, совпадает с extract_features")
+
+    def dataframe_path(x):
+        preprocessing.extract_features(pd.DataFrame({'text': [x]}))
+
+    print("Доп. признаки одного сообщения, мкс:")
+    print(f"  extract_features (DataFrame): {timeit(dataframe_path, cleaned, 1):9.1f}")
+    print(f"  extract_features_row:         {timeit(preprocessing.extract_features_row, cleaned):9.1f}")
+
+
+def grow_keywords(cleaned, size):
+    """SPAM_KEYWORDS, дополненный частыми словами и биграммами корпуса до size штук"""
+    keywords = list(preprocessing.SPAM_KEYWORDS)
+    counts = Counter()
+    for text in cleaned:
+        tokens = text.split()
+        counts.update(t for t in tokens if len(t) > 3)
+        counts.update(' '.join(pair) for pair in zip(tokens, tokens[1:]))
+    seen = set(keywords)
+    for candidate, _ in counts.most_common():
+        if len(keywords) >= size:
+            break
+        if candidate not in seen:
+            seen.add(candidate)
+            keywords.append(candidate)
+    return keywords
+
+
+def bench_keywords(args):
+    _, cleaned, _ = load_corpus(args.limit)
+    print("Флаги ключевых слов на сообщение, мкс:")
+    print(f"  {'слов':>6} {'поиск по одному':>16} {'Ахо–Корасик':>12}")
+    for size in [int(x) for x in args.sizes.split(',')]:
+        keywords = grow_keywords(cleaned, size)
+        automaton = preprocessing.KeywordAutomaton(keywords)
+        for text in cleaned:
+            if automaton.flags(text) != [int(k in text) for k in keywords]:
+                raise SystemExit(f"Автомат расходится с поиском подстроки: {text!r}")
+
+        def naive(x):
+            return [int(k in x) for k in keywords]
+
+        print(f"  {len(keywords):>6} {timeit(naive, cleaned):16.1f} {timeit(automaton.flags, cleaned):12.1f}")
+
+
+def mutate(text, rng, changes=2):
+    """Заменяет changes случайных слов текста словами из того же текста"""
+    words = text.split()
+    for _ in range(min(changes, len(words))):
+        words[rng.randrange(len(words))] = rng.choice(words)[::-1]
+    return ' '.join(words)
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def bench_neardup(args):
+    from near_duplicates import NearDuplicateIndex
+
+    raw, _, labels = load_corpus(args.limit)
+    # как в боте: слова tokenize() без лемматизации
+    normalized = [' '.join(preprocessing.tokenize(t)) for t in raw]
+    rng = random.Random(42)
+    spam = [t for t, label in zip(normalized, labels) if label == 'spam' and len(t) >= 40]
+    ham = [t for t, label in zip(normalized, labels) if label == 'ham' and len(t) >= 40]
+    print(f"Спам-сообщений для индекса: {len(spam)}, запросов из ham: {len(ham[:500])}")
+    print(f"  {'записей':>8} {'p50, мкс':>9} {'p99, мкс':>9} {'найдено дублей':>15} {'ложных на ham':>14}")
+    for size in [int(x) for x in args.sizes.split(',')]:
+        index = NearDuplicateIndex(max_entries=size)
+        base = spam[:min(len(spam), size)]
+        for text in base:
+            index.add(text)
+        while len(index) < size:
+            index.add(mutate(rng.choice(spam), rng, changes=6))
+
+        queries = [mutate(t, rng) for t in base[-500:]]
+        timings = []
+        found = 0
+        for text in queries + ham[:500]:
+            start = time.perf_counter()
+            hit = index.query(text)
+            timings.append((time.perf_counter() - start) * 1e6)
+            if hit is not None and len(timings) <= len(queries):
+                found += 1
+        false_hits = index.hits - found
+        print(f"  {len(index):>8} {percentile(timings, 50):9.1f} {percentile(timings, 99):9.1f} "
+              f"{found:>7}/{len(queries):<7} {false_hits:>7}/{len(ham[:500]):<6}")
+
+
+def memory_status():
+    """RSS процесса в МБ: всего, анонимная память и страницы файлов (общие между процессами)"""
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+
+def _measure_load(args):
+    """Выполняется в отдельном процессе: загрузка модели одним из способов"""
+    import model_bundle
+
+    before = memory_status()
+    start = time.perf_counter()
+    if args.kind == 'pickle':
+        model = joblib.load(paths['model'])
+        vectorizer = joblib.load(paths['vectorizer'])
+        scorer = FusedLinearScorer.from_sklearn(model, vectorizer)
+    else:
+        scorer = FusedLinearScorer.from_bundle(model_bundle.load_bundle(paths['bundle']))
+    scorer.predict_proba('работа деньга', np.zeros(len(preprocessing.FEATURE_COLUMNS)))
+    elapsed = time.perf_counter() - start
+    after = memory_status()
+    print(json.dumps({
+        'seconds': elapsed,
+        **{key: after[key] - before.get(key, 0) for key in after},
+    }))
+
+
+def bench_bundle(args):
+    import model_bundle
+
+    model = joblib.load(paths['model'])
+    vectorizer = joblib.load(paths['vectorizer'])
+    bundle_scorer = FusedLinearScorer.from_bundle(model_bundle.load_bundle(paths['bundle']))
+    spam_col = list(model.classes_).index('spam')
+    _, cleaned, _ = load_corpus(args.limit)
+    add = extra_matrix(cleaned)
+    expected = model.predict_proba(hstack([vectorizer.transform(cleaned), add]).tocsr())[:, spam_col]
+    max_diff = float(np.max(np.abs(expected - bundle_scorer.predict_proba_many(cleaned, add))))
+    print(f"Сообщений: {len(cleaned)}, макс. расхождение бандла с predict_proba: {max_diff:.3e}")
+
+    pickle_size = os.path.getsize(paths['model']) + os.path.getsize(paths['vectorizer'])
+    bundle_path = os.path.join(paths['bundle'], model_bundle.current_version(paths['bundle']))
+    bundle_size = sum(os.path.getsize(os.path.join(bundle_path, f)) for f in os.listdir(bundle_path))
+    print(f"Размер на диске: pickle {pickle_size / 1024:.0f} КБ, бандл {bundle_size / 1024:.0f} КБ")
+    print(f"  {'способ':>7} {'загрузка, мс':>13} {'RSS, МБ':>8} {'анонимная':>10} {'файловая':>9}")
+    for kind in ('pickle', 'bundle'):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '_load', kind],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"  {kind:>7} {r['seconds'] * 1000:13.1f} {r['VmRSS']:8.2f} {r['RssAnon']:10.2f} {r['RssFile']:9.2f}")
+
+
+def load_test_split():
+    """Отложенная выборка: data/processed/test_data.csv или тот же сплит, что в create_test_data.py"""
+    if os.path.exists(paths['test']):
+        df = pd.read_csv(paths['test'])
+    else:
+        combined = pd.read_csv(paths['combined'])
+        _, df = train_test_split(combined, test_size=0.2, stratify=combined['label'], random_state=42)
+    texts = df['text'].astype(str).tolist()
+    return [preprocessing.clean_text(t) for t in texts], df['label'].tolist()
+
+
+def bench_precision(args):
+    import model_bundle
+
+    model = joblib.load(paths['model'])
+    vectorizer = joblib.load(paths['vectorizer'])
+    cleaned, labels = load_test_split()
+    add = extra_matrix(cleaned)
+    y_true = np.array(labels) == 'spam'
+    items = list(zip(cleaned, add))
+    feature_cols = list(preprocessing.FEATURE_COLUMNS)
+    print(f"Отложенная выборка: {len(cleaned)} сообщений, спама {int(y_true.sum())}")
+    print(f"  {'точность':>8} {'precision':>9} {'recall':>7} {'смена вердикта':>15} {'макс. Δp':>9} "
+          f"{'веса, КБ':>9} {'бандл, КБ':>10} {'мкс/сообщ.':>11}")
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for precision in ('float64', 'float16', 'int8'):
+            bundle_dir = os.path.join(tmp, precision)
+            version = model_bundle.export_bundle(model, vectorizer, feature_cols, bundle_dir, precision=precision)
+            scorer = FusedLinearScorer.from_bundle(model_bundle.load_bundle(bundle_dir))
+            probs = scorer.predict_proba_many(cleaned, add)
+            if reference is None:
+                reference = probs
+            y_pred = probs > 0.5
+            flips = int(np.sum(y_pred != (reference > 0.5)))
+            version_dir = os.path.join(bundle_dir, version)
+            disk = sum(os.path.getsize(os.path.join(version_dir, f)) for f in os.listdir(version_dir))
+            weights = scorer.term_weights.nbytes + scorer.idf.nbytes
+            latency = timeit(lambda item: scorer.predict_proba(*item), items)
+            print(f"  {precision:>8} {precision_score(y_true, y_pred):9.4f} {recall_score(y_true, y_pred):7.4f} "
+                  f"{flips:>15} {np.max(np.abs(probs - reference)):9.2e} {weights / 1024:9.1f} "
+                  f"{disk / 1024:10.1f} {latency:11.1f}")
+
+
+def write_corpus(path, multiplier, seed=42):
+    """combined.csv, повторённый multiplier раз и перемешанный; к повторам дописан номер"""
+    df = pd.read_csv(paths['combined'])
+    parts = []
+    for i in range(multiplier):
+        part = df.copy()
+        if i:
+            # цифры clean_text выбрасывает: тексты разные, а очищенные совпадают с исходными
+            part['text'] = part['text'].astype(str) + f' {i}'
+        parts.append(part)
+    corpus = pd.concat(parts).sample(frac=1, random_state=seed)
+    corpus.to_csv(path, index=False)
+    return len(corpus)
+
+
+def _measure_train(args):
+    """Выполняется в отдельном процессе: обучение одним из способов"""
+    import train_streaming
+
+    start = time.perf_counter()
+    if args.kind == 'streaming':
+        _, stats = train_streaming.train_streaming(args.csv, args.chunk_size, epochs=1)
+        quality = {'precision': stats['precision'], 'recall': stats['recall']}
+    else:
+        # как train_model.py: весь CSV в DataFrame, TF-IDF и плотные доп. признаки
+        import train_model
+        df = pd.read_csv(args.csv)
+        df['text'] = preprocessing.clean_texts(df['text'].astype(str))
+        train_model.train(preprocessing.extract_features(df))
+        quality = {}
+    print(json.dumps({
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': utils.peak_rss_mb(),
+        **quality,
+    }))
+
+
+def bench_streaming(args):
+    kinds = args.kinds.split(',')
+    print(f"  {'строк':>8} {'CSV, МБ':>8} " + ' '.join(f"{kind + ', с':>14} {'RSS, МБ':>8}" for kind in kinds))
+    with tempfile.TemporaryDirectory() as tmp:
+        for multiplier in [int(x) for x in args.sizes.split(',')]:
+            path = os.path.join(tmp, f'corpus_{multiplier}.csv')
+            rows = write_corpus(path, multiplier)
+            cells = []
+            for kind in kinds:
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '_train', kind, path,
+                     '--chunk-size', str(args.chunk_size)],
+                    capture_output=True, text=True, check=True).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                cells.append(f"{r['seconds']:14.1f} {r['peak_rss_mb']:8.0f}")
+            print(f"  {rows:>8} {os.path.getsize(path) / 2 ** 20:8.1f} " + ' '.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки классификации спама')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_scorer = sub.add_parser('scorer', help='свёрнутый скорер против sklearn')
+    p_scorer.add_argument('--limit', type=int, default=None, help='сколько сообщений взять из combined.csv')
+    p_scorer.set_defaults(func=bench_scorer)
+
+    p_features = sub.add_parser('features', help='доп. признаки без pandas против DataFrame')
+    p_features.add_argument('--limit', type=int, default=None, help='сколько сообщений взять из combined.csv')
+    p_features.set_defaults(func=bench_features)
+
+    p_keywords = sub.add_parser('keywords', help='автомат ключевых слов при росте списка')
+    p_keywords.add_argument('--limit', type=int, default=None, help='сколько сообщений взять из combined.csv')
+    p_keywords.add_argument('--sizes', default='28,100,300,1000', help='размеры списка ключевых слов')
+    p_keywords.set_defaults(func=bench_keywords)
+
+    p_neardup = sub.add_parser('neardup', help='поиск почти-дубликатов при росте индекса')
+    p_neardup.add_argument('--limit', type=int, default=None, help='сколько сообщений взять из combined.csv')
+    p_neardup.add_argument('--sizes', default='1000,10000,100000', help='размеры индекса')
+    p_neardup.set_defaults(func=bench_neardup)
+
+    p_bundle = sub.add_parser('bundle', help='загрузка бандла против pickle-файлов')
+    p_bundle.add_argument('--limit', type=int, default=None, help='сколько сообщений взять из combined.csv')
+    p_bundle.set_defaults(func=bench_bundle)
+
+    p_precision = sub.add_parser('precision', help='качество, размер и скорость float64 / float16 / int8 весов')
+    p_precision.set_defaults(func=bench_precision)
+
+    p_streaming = sub.add_parser('streaming', help='пиковый RSS потокового обучения и train_model.py от размера корпуса')
+    p_streaming.add_argument('--sizes', default='1,4,16', help='во сколько раз увеличить combined.csv')
+    p_streaming.add_argument('--kinds', default='streaming,memory', help='способы обучения через запятую')
+    p_streaming.add_argument('--chunk-size', type=int, default=10000, help='строк в одной части')
+    p_streaming.set_defaults(func=bench_streaming)
+
+    p_train = sub.add_parser('_train')
+    p_train.add_argument('kind', choices=['streaming', 'memory'])
+    p_train.add_argument('csv')
+    p_train.add_argument('--chunk-size', type=int, default=10000)
+    p_train.set_defaults(func=_measure_train)
+
+    p_load = sub.add_parser('_load')
+    p_load.add_argument('kind', choices=['pickle', 'bundle'])
+    p_load.set_defaults(func=_measure_load)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Кэш очищенного текста для обучения и оценки: clean_text(текст) по ключу
+blake2b(текст). Хранится по столбцам в одном .npz (ключи, UTF-8 байты
+очищенных текстов подряд и смещения). Кэш привязан к
+preprocessing.preprocessing_version(): после правки clean_text он
+считается пустым и пересобирается при следующем запуске.
+
+    python src/clean_cache.py stats   # сколько записей и для какой версии
+    python src/clean_cache.py clear   # удалить файл кэша
+"""
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+import preprocessing
+
+
+KEY_SIZE = 16
+
+
+def text_key(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=KEY_SIZE).digest()
+
+
+class CleanCache:
+    def __init__(self, path, version=None):
+        self.path = path
+        self.version = version or preprocessing.preprocessing_version()
+        self._data = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = False  # файл есть, но от другой версии clean_text
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path, version=None):
+        cache = cls(path, version)
+        if not os.path.exists(path):
+            return cache
+        with np.load(path) as f:
+            if str(f['version']) != cache.version:
+                cache.stale = True
+                return cache
+            keys, blob, offsets = f['keys'], f['blob'].tobytes(), f['offsets']
+        for i, key in enumerate(keys):
+            cache._data[key.tobytes()] = blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+        return cache
+
+    def save(self):
+        """Записывает кэш, если он менялся (через временный файл)"""
+        if not self._dirty:
+            return
+        keys = list(self._data)
+        encoded = [self._data[k].encode('utf-8') for k in keys]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp.npz'
+        np.savez(
+            tmp,
+            version=np.array(self.version),
+            # не dtype 'S16': numpy обрезает нулевые байты в конце ключа
+            keys=np.frombuffer(b''.join(keys), dtype=np.uint8).reshape(len(keys), KEY_SIZE),
+            blob=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            offsets=offsets,
+        )
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def clean(self, texts, workers=1):
+        """clean_text для texts: из кэша, недостающие — через preprocessing.clean_texts"""
+        texts = list(texts)
+        keys = [text_key(t) for t in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._data:
+                missing.setdefault(key, text)
+        self.misses += len(missing)
+        self.hits += len(texts) - sum(1 for k in keys if k in missing)
+        if missing:
+            cleaned = preprocessing.clean_texts(list(missing.values()), workers=workers)
+            self._data.update(zip(missing, cleaned))
+            self._dirty = True
+        return [self._data[k] for k in keys]
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        return {
+            'entries': len(self._data),
+            'version': self.version,
+            'stale': self.stale,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def clean_with_cache(texts, path, workers=1, enabled=True):
+    """clean_text для texts через кэш в path; enabled=False — без кэша"""
+    if not enabled:
+        return preprocessing.clean_texts(texts, workers=workers)
+    cache = CleanCache.load(path)
+    cleaned = cache.clean(texts, workers=workers)
+    cache.save()
+    stats = cache.get_stats()
+    reset = ', кэш сброшен: изменился clean_text' if stats['stale'] else ''
+    print(f"Кэш очищенного текста: из кэша {stats['hits']}, очищено {stats['misses']}{reset}")
+    return cleaned
+
+
+def main():
+    import utils
+
+    parser = argparse.ArgumentParser(description='Кэш очищенного текста')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args()
+    path = utils.get_paths()['clean_cache']
+    if args.command == 'clear':
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"Кэш удалён: {path}")
+        return
+    cache = CleanCache.load(path)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    state = 'устарел' if cache.stale else 'актуален'
+    print(f"{path}: записей {len(cache)}, {size / 1024:.0f} КБ, версия clean_text {cache.version} ({state})")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,12 @@ import utils
 
 paths = utils.get_paths()
 
+def load_votes(path):
+    """Решения голосований и автоудалений бота; повторное решение по тексту заменяет прежнее"""
+    votes_df = pd.read_csv(path, usecols=['text', 'label']).dropna()
+    votes_df = votes_df[votes_df['label'].isin(['ham', 'spam'])]
+    return votes_df.drop_duplicates('text', keep='last')
+
 def create_test_data():
     combined_df = pd.read_csv(paths['combined'])
     print(f"Загружено сообщений: {len(combined_df)}")
@@ -16,6 +22,14 @@ def create_test_data():
         random_state=42
     )
     
+    # решения из bot_votes.csv идут только в обучение: тестовая часть остаётся той же, что
+    # у других скриптов с этим сплитом, а тексты с решением из неё убираются
+    if os.path.exists(paths['votes']):
+        votes_df = load_votes(paths['votes'])
+        train_df = pd.concat([train_df[~train_df['text'].isin(votes_df['text'])], votes_df])
+        test_df = test_df[~test_df['text'].isin(votes_df['text'])]
+        print(f"Добавлено решений из голосований: {len(votes_df)}")
+    
     os.makedirs(os.path.dirname(paths['test']), exist_ok=True)
     
     test_df.to_csv(paths['test'], index=False)
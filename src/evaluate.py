@@ -5,6 +5,8 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 import utils
 import preprocessing
+import clean_cache
+import os
 import numpy as np
 from scipy.sparse import hstack
 
@@ -21,7 +23,9 @@ def evaluate_model():
     test_df = pd.read_csv(TEST_DATA_PATH)
     print(f"Загружено тестовых сообщений: {len(test_df)}")
     
-    test_df['text'] = test_df['text'].astype(str).apply(preprocessing.clean_text)
+    test_df['text'] = clean_cache.clean_with_cache(
+        test_df['text'].astype(str), paths['clean_cache'], enabled=os.getenv('CLEAN_CACHE', '1') == '1'
+    )
     features_df = preprocessing.extract_features(test_df.copy())
     
     X_test_text = features_df['text']
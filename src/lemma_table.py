@@ -0,0 +1,327 @@
+"""
+Предвычисленная таблица лемм: словоформа -> нормальная форма по pymorphy2.
+Позволяет боту не загружать словари pymorphy2. В таблице все слова
+тренировочной части корпуса, все формы лемм словаря векторайзера и все
+формы ключевых слов: по очищенному тексту считаются не только термины, но
+и доп. признаки (has_<ключевое слово>, length), поэтому внесловарные слова
+тоже должны приводиться к той же форме, что и в полном пайплайне. Слова,
+которых нет в таблице, возвращаются как есть.
+
+    <lemma_table>/manifest.json   версия формата, число словоформ и контрольная сумма
+    <lemma_table>/forms.npy       словоформы в UTF-8, отсортированы (строки фиксированной длины)
+    <lemma_table>/lemma_ids.npy   индекс нормальной формы для каждой словоформы
+    <lemma_table>/lemmas.npy      нормальные формы
+    <lemma_table>/long.json       словоформы длиннее WIDTH байт
+
+    python src/lemma_table.py build            # построить по текущему векторайзеру
+    python src/lemma_table.py verify [--csv data/processed/test_data.csv] [--limit N]
+                                               # сравнить оценки с полным пайплайном
+
+verify по умолчанию проверяет тестовую часть: при сборке она не
+использовалась, поэтому расхождения показывают, как таблица справляется
+с новыми сообщениями.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+FORMAT_VERSION = 3
+_WORD_RE = re.compile(r'^[а-яё]+$')
+# ширина строк в forms.npy и lemmas.npy, байт UTF-8 (24 буквы кириллицы);
+# словоформы, у которых она сама или нормальная форма длиннее, лежат в long.json
+WIDTH = 48
+# сколько последних слов держать в словаре перед массивами; при переполнении он очищается
+RECENT_SIZE = 20000
+
+
+class LemmaTable:
+    """
+    Лемматизатор по таблице; неизвестные слова возвращаются как есть.
+    Словоформы — отсортированный массив строк фиксированной ширины (как
+    SortedVocabulary в model_bundle.py), поиск одним searchsorted на всё
+    сообщение. Массивы читаются через np.load(mmap_mode='r'), поэтому
+    процессы бота делят одну копию в page cache.
+    """
+
+    def __init__(self, forms, lemma_ids, lemmas, long_forms):
+        self.forms = forms            # S{WIDTH}, словоформы в UTF-8 по возрастанию
+        self.lemma_ids = lemma_ids    # int32, индекс в lemmas для каждой словоформы
+        self.lemmas = lemmas          # S{WIDTH}: сначала термины словаря по индексу, затем остальные
+        self.long_forms = long_forms  # словоформа -> нормальная форма, если одна из них длиннее WIDTH
+        # последние слова процесса: поиск по массиву дороже словаря, а частые слова повторяются
+        self._recent = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_forms(cls, lemmas, forms):
+        """Таблица в памяти из списка нормальных форм и словаря словоформа -> индекс в lemmas"""
+        encoded = [lemma.encode('utf-8') for lemma in lemmas]
+        long_forms = {}
+        items = []
+        for form, idx in forms.items():
+            key = form.encode('utf-8')
+            if len(key) > WIDTH or len(encoded[idx]) > WIDTH:
+                long_forms[form] = lemmas[idx]
+            else:
+                items.append((key, idx))
+        items.sort()
+        return cls(np.array([key for key, _ in items], dtype=f'S{WIDTH}'),
+                   np.array([idx for _, idx in items], dtype=np.int32),
+                   np.array([lemma if len(lemma) <= WIDTH else b'' for lemma in encoded], dtype=f'S{WIDTH}'),
+                   long_forms)
+
+    def __len__(self):
+        return len(self.forms) + len(self.long_forms)
+
+    def _lookup(self, words):
+        """Нормальные формы из массивов, '' для слов не из таблицы"""
+        result = [self.long_forms.get(word, '') for word in words]
+        encoded = [word.encode('utf-8') for word in words]
+        short = [i for i, key in enumerate(encoded) if len(key) <= WIDTH]
+        if short and len(self.forms):
+            query = np.array([encoded[i] for i in short], dtype=self.forms.dtype)
+            pos = np.searchsorted(self.forms, query)
+            pos[pos == len(self.forms)] = 0
+            found = self.forms[pos] == query
+            lemmas = self.lemmas[self.lemma_ids[pos[found]]].tolist()
+            for i, lemma in zip(np.flatnonzero(found).tolist(), lemmas):
+                result[short[i]] = lemma.decode('utf-8')
+        return result
+
+    def lemmatize_many(self, words):
+        """Нормальные формы для списка слов: недавние из _recent, остальные одним searchsorted"""
+        recent = self._recent
+        lemmas = [recent.get(word) for word in words]
+        missing = [i for i, lemma in enumerate(lemmas) if lemma is None]
+        if missing:
+            if len(recent) + len(missing) > RECENT_SIZE:
+                recent.clear()
+            for i, lemma in zip(missing, self._lookup([words[i] for i in missing])):
+                lemmas[i] = recent[words[i]] = lemma
+        result = []
+        for word, lemma in zip(words, lemmas):
+            if lemma:
+                self.hits += 1
+                result.append(lemma)
+            else:
+                self.misses += 1
+                result.append(word)
+        return result
+
+    def clear(self):
+        self._recent.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def lemmatize(self, word):
+        return self.lemmatize_many([word])[0]
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'forms': len(self),
+            'lemmas': len(self.lemmas),
+            'recent': len(self._recent),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def save(self, path):
+        """Пишет таблицу во временный каталог и подменяет им path"""
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        digest = hashlib.sha1()
+        for name in ('forms', 'lemma_ids', 'lemmas'):
+            array = np.ascontiguousarray(getattr(self, name))
+            np.save(os.path.join(tmp, f'{name}.npy'), array)
+            digest.update(array.tobytes())
+        long_json = json.dumps(self.long_forms, ensure_ascii=False, sort_keys=True)
+        digest.update(long_json.encode('utf-8'))
+        with open(os.path.join(tmp, 'long.json'), 'w', encoding='utf-8') as f:
+            f.write(long_json)
+        manifest = {'format': FORMAT_VERSION, 'width': WIDTH, 'forms': len(self), 'lemmas': len(self.lemmas),
+                    'sha1': digest.hexdigest()}
+        with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        # уже загруженная таблица остаётся рабочей: отображённые файлы живут до закрытия
+        old = path + '.old'
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия таблицы лемм: {manifest.get('format')}")
+        with open(os.path.join(path, 'long.json'), encoding='utf-8') as f:
+            long_forms = json.load(f)
+        # np.asarray убирает накладные расходы np.memmap на индексацию, отображение в память остаётся
+        arrays = [np.asarray(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+                  for name in ('forms', 'lemma_ids', 'lemmas')]
+        return cls(*arrays, long_forms)
+
+
+def build_lemma_table(vocabulary, corpus_words, morph, normal_forms=None, keywords=()):
+    """
+    Строит таблицу по словарю векторайзера (термин -> индекс).
+    В таблицу попадают слова корпуса, все словоформы лемм словаря и все
+    словоформы нормальных форм слов из keywords, каждая со своей нормальной
+    формой по pymorphy2. normal_forms — словарь словоформа -> нормальная
+    форма от прошлых сборок, дополняется новыми словами.
+    """
+    if normal_forms is None:
+        normal_forms = {}
+
+    def normal_form_of(word):
+        normal_form = normal_forms.get(word)
+        if normal_form is None:
+            normal_form = normal_forms[word] = morph.parse(word)[0].normal_form
+        return normal_form
+
+    lemmas = [None] * len(vocabulary)
+    for term, idx in vocabulary.items():
+        lemmas[idx] = term
+    keyword_lemmas = {normal_form_of(word) for keyword in keywords for word in keyword.split()}
+
+    candidates = set(corpus_words)
+    for lemma in lemmas + sorted(keyword_lemmas):
+        for parse in morph.parse(lemma):
+            candidates.update(form.word for form in parse.lexeme)
+
+    index = {term: int(idx) for term, idx in vocabulary.items()}
+    forms = {}
+    for form in sorted(candidates):
+        if not _WORD_RE.match(form):
+            continue
+        normal_form = normal_form_of(form)
+        idx = index.get(normal_form)
+        if idx is None:
+            idx = index[normal_form] = len(lemmas)
+            lemmas.append(normal_form)
+        forms[form] = idx
+    return LemmaTable.from_forms(lemmas, forms)
+
+
+def build_from_paths(paths, vectorizer=None):
+    """Строит таблицу по корпусу и векторайзеру из paths и сохраняет её"""
+    import joblib
+    import pandas as pd
+    import preprocessing
+
+    if vectorizer is None:
+        vectorizer = joblib.load(paths['vectorizer'])
+    words = set()
+    # только тренировочная часть (с решениями из bot_votes.csv, см. create_test_data.py):
+    # тестовая остаётся новыми словами для verify
+    for text in pd.read_csv(paths['train'])['text'].astype(str):
+        words.update(preprocessing.tokenize(text))
+    # нормальные формы pymorphy2 — почти всё время сборки, между сборками они не меняются
+    version = preprocessing.preprocessing_version()
+    normal_forms = load_normal_forms(paths['normal_forms'], version)
+    known = len(normal_forms)
+    table = build_lemma_table(vectorizer.vocabulary_, words, preprocessing.get_morph(), normal_forms,
+                              preprocessing.SPAM_KEYWORDS)
+    table.save(paths['lemma_table'])
+    if len(normal_forms) != known:
+        save_normal_forms(paths['normal_forms'], version, normal_forms)
+    return table
+
+
+def load_normal_forms(path, version):
+    """Сохранённые нормальные формы; пустой словарь, если файла нет или он от другой версии clean_text"""
+    if not os.path.exists(path):
+        return {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    return data['forms'] if data.get('version') == version else {}
+
+
+def save_normal_forms(path, version, forms):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        json.dump({'version': version, 'forms': forms}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def verify(paths, csv_path=None, limit=None):
+    """Сравнивает оценки модели с таблицей лемм и с полным пайплайном pymorphy2 на текстах csv_path"""
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from scipy.sparse import hstack
+    import preprocessing
+
+    model = joblib.load(paths['model'])
+    vectorizer = joblib.load(paths['vectorizer'])
+    table = LemmaTable.load(paths['lemma_table'])
+    spam_col = list(model.classes_).index('spam')
+
+    texts = pd.read_csv(csv_path or paths['test'])['text'].astype(str).tolist()
+    if limit:
+        texts = texts[:limit]
+
+    def score(cleaned):
+        add = preprocessing.extract_features_matrix(cleaned)
+        return model.predict_proba(hstack([vectorizer.transform(cleaned), add]).tocsr())[:, spam_col]
+
+    full_cleaned = [preprocessing.clean_text(t) for t in texts]
+    previous = preprocessing.lemmatizer
+    preprocessing.set_lemmatizer(table)
+    try:
+        table_cleaned = [preprocessing.clean_text(t) for t in texts]
+    finally:
+        preprocessing.set_lemmatizer(previous)
+
+    full_p = score(full_cleaned)
+    table_p = score(table_cleaned)
+    diff = np.abs(full_p - table_p)
+    flips = np.flatnonzero((full_p > 0.5) != (table_p > 0.5))
+    features_differ = np.any(preprocessing.extract_features_matrix(full_cleaned)
+                             != preprocessing.extract_features_matrix(table_cleaned), axis=1)
+
+    print(f"Сообщений: {len(texts)}, словоформ в таблице: {len(table)}")
+    print(f"Очищенный текст отличается: {sum(a != b for a, b in zip(full_cleaned, table_cleaned))}")
+    print(f"Доп. признаки отличаются: {int(features_differ.sum())}")
+    print(f"Расхождение вероятности: макс {diff.max():.4f}, среднее {diff.mean():.6f}")
+    print(f"Разные вердикты: {len(flips)}")
+    for i in flips[:20]:
+        print(f"  p={full_p[i]:.3f} -> {table_p[i]:.3f}: {texts[i][:80]!r}")
+    return len(flips)
+
+
+def main():
+    import utils
+
+    paths = utils.get_paths()
+    parser = argparse.ArgumentParser(description='Таблица лемм для бота')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='построить таблицу по текущему векторайзеру')
+    p_verify = sub.add_parser('verify', help='сравнить оценки с полным пайплайном')
+    p_verify.add_argument('--csv', default=paths['test'],
+                          help='CSV со столбцом text; по умолчанию тестовая часть, не использованная при сборке')
+    p_verify.add_argument('--limit', type=int, default=None, help='сколько сообщений взять из CSV')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        table = build_from_paths(paths)
+        print(f"Таблица лемм сохранена в {paths['lemma_table']}: {len(table)} словоформ")
+    else:
+        verify(paths, args.csv, args.limit)
+
+
+if __name__ == '__main__':
+    main()
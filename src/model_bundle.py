@@ -0,0 +1,157 @@
+"""
+Компактный бандл модели с фиксированной раскладкой вместо pickle-файлов joblib.
+
+    <bundle>/current.json          {"version": "..."} — активная версия
+    <bundle>/<version>/manifest.json
+    <bundle>/<version>/coef.npy    веса логистической регрессии (float64)
+    <bundle>/<version>/idf.npy     idf словаря (float64, float16 или int8)
+    <bundle>/<version>/term_weights.npy  idf * coef для терминов словаря (float64, float16 или int8)
+    <bundle>/<version>/terms.npy   термины словаря, отсортированы (строки фиксированной длины)
+    <bundle>/<version>/columns.npy индекс столбца для каждого термина из terms.npy
+
+Массивы читаются через np.load(mmap_mode='r'), поэтому несколько процессов
+бота делят одну физическую копию в page cache. Для int8 масштабы
+(weight_scale, idf_scale) записаны в манифест.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+KEEP_VERSIONS = 3
+
+
+class SortedVocabulary:
+    """Словарь векторайзера в виде отсортированного массива строк"""
+
+    def __init__(self, terms, columns):
+        self.terms = terms
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.terms)
+
+    def lookup(self, tokens):
+        """Индексы столбцов для tokens, -1 для слов вне словаря"""
+        if not tokens:
+            return np.empty(0, dtype=np.int64)
+        query = np.array(tokens, dtype=self.terms.dtype)
+        pos = np.searchsorted(self.terms, query)
+        pos[pos == len(self.terms)] = 0
+        found = self.terms[pos] == query
+        return np.where(found, self.columns[pos], -1)
+
+
+class ModelBundle:
+    """Загруженный бандл: манифест и отображённые в память массивы"""
+
+    def __init__(self, path, manifest, coef, idf, term_weights, vocabulary):
+        self.path = path
+        self.manifest = manifest
+        self.coef = coef
+        self.idf = idf
+        self.term_weights = term_weights
+        self.vocabulary = vocabulary
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def feature_columns(self):
+        return self.manifest['feature_columns']
+
+
+def export_bundle(model, vectorizer, feature_columns, bundle_dir, positive_label='spam', precision='float64'):
+    """Сохраняет LogisticRegression + TfidfVectorizer в новую версию бандла и делает её активной"""
+    from scorer import quantize
+
+    coef = np.ascontiguousarray(model.coef_[0], dtype=np.float64)
+    idf = np.ascontiguousarray(vectorizer.idf_, dtype=np.float64)
+    term_weights, weight_scale = quantize(idf * coef[:len(idf)], precision)
+    stored_idf, idf_scale = quantize(idf, precision)
+    items = sorted(vectorizer.vocabulary_.items())
+    terms = np.array([t for t, _ in items])
+    columns = np.array([c for _, c in items], dtype=np.int32)
+
+    digest = hashlib.sha1(coef.tobytes() + idf.tobytes() + terms.tobytes() + precision.encode()).hexdigest()[:10]
+    version = time.strftime('%Y%m%d_%H%M%S') + '_' + digest
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'n_terms': len(items),
+        'feature_columns': list(feature_columns),
+        'classes': [str(c) for c in model.classes_],
+        'positive_label': positive_label,
+        'intercept': float(model.intercept_[0]),
+        'precision': precision,
+        'weight_scale': weight_scale,
+        'idf_scale': idf_scale,
+        'vectorizer': {
+            'token_pattern': vectorizer.token_pattern,
+            'lowercase': bool(vectorizer.lowercase),
+            'sublinear_tf': bool(vectorizer.sublinear_tf),
+            'binary': bool(vectorizer.binary),
+            'norm': vectorizer.norm,
+            'use_idf': bool(vectorizer.use_idf),
+        },
+    }
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    tmp_dir = os.path.join(bundle_dir, f'.{version}.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, 'coef.npy'), coef)
+    np.save(os.path.join(tmp_dir, 'idf.npy'), stored_idf)
+    np.save(os.path.join(tmp_dir, 'term_weights.npy'), term_weights)
+    np.save(os.path.join(tmp_dir, 'terms.npy'), terms)
+    np.save(os.path.join(tmp_dir, 'columns.npy'), columns)
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_dir, os.path.join(bundle_dir, version))
+
+    pointer_tmp = os.path.join(bundle_dir, 'current.json.tmp')
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': version}, f)
+    os.replace(pointer_tmp, os.path.join(bundle_dir, 'current.json'))
+
+    _remove_old_versions(bundle_dir, keep=version)
+    return version
+
+
+def _remove_old_versions(bundle_dir, keep):
+    versions = sorted(
+        d for d in os.listdir(bundle_dir)
+        if not d.startswith('.') and os.path.isdir(os.path.join(bundle_dir, d))
+    )
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != keep:
+            shutil.rmtree(os.path.join(bundle_dir, old), ignore_errors=True)
+
+
+def current_version(bundle_dir):
+    """Активная версия бандла (из current.json)"""
+    with open(os.path.join(bundle_dir, 'current.json'), encoding='utf-8') as f:
+        return json.load(f)['version']
+
+
+def load_bundle(bundle_dir, version=None, mmap=True):
+    """Загружает активную (или указанную) версию бандла"""
+    version = version or current_version(bundle_dir)
+    path = os.path.join(bundle_dir, version)
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата бандла: {manifest.get('format_version')}")
+    mode = 'r' if mmap else None
+    coef = np.load(os.path.join(path, 'coef.npy'), mmap_mode=mode)
+    idf = np.load(os.path.join(path, 'idf.npy'), mmap_mode=mode)
+    term_weights = np.load(os.path.join(path, 'term_weights.npy'), mmap_mode=mode)
+    terms = np.load(os.path.join(path, 'terms.npy'), mmap_mode=mode)
+    columns = np.load(os.path.join(path, 'columns.npy'), mmap_mode=mode)
+    if len(terms) != manifest['n_terms'] or len(idf) != manifest['n_terms']:
+        raise ValueError(f"Бандл {path} повреждён: размеры массивов не совпадают с манифестом")
+    return ModelBundle(path, manifest, coef, idf, term_weights, SortedVocabulary(terms, columns))
@@ -0,0 +1,162 @@
+"""
+Дообучение онлайн-модели (src/online_model.py) на решениях из журнала
+голосований бота (bot_votes.csv: автоудаления, голосования, /delete).
+
+    python src/online_learning.py bootstrap [--epochs 5]   # начальные веса по data/combined.csv
+    python src/online_learning.py run [--interval 60]      # следить за журналом и публиковать снимки
+    python src/online_learning.py once                     # один проход по новым строкам журнала
+
+Новые строки журнала дообучают модель пакетами по --batch-size с весом
+--vote-weight: одно решение админа весит как несколько строк корпуса,
+чтобы модель подстраивалась под новую рассылку за минуты. К ним
+подмешивается --replay случайных строк корпуса: пакет из одного спама
+сдвигает порог модели, и точность на остальных сообщениях падает.
+После каждого прохода с новыми строками публикуется снимок; бот с
+ONLINE_MODEL=1 подхватывает его без перезапуска.
+"""
+import argparse
+import csv
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import precision_score, recall_score
+from sklearn.model_selection import train_test_split
+from sklearn.utils.class_weight import compute_class_weight
+
+import utils
+import preprocessing
+import clean_cache
+import online_model
+
+paths = utils.get_paths()
+
+
+def _prepare(texts, use_cache=True):
+    if use_cache:
+        cleaned = clean_cache.clean_with_cache(texts, paths['clean_cache'])
+    else:
+        cleaned = preprocessing.clean_texts(texts)
+    return cleaned, preprocessing.extract_features_matrix(cleaned)
+
+
+def fit_batches(model, cleaned, extras, labels, batch_size, sample_weight=None):
+    if sample_weight is None:
+        sample_weight = np.ones(len(labels))
+    for start in range(0, len(labels), batch_size):
+        end = start + batch_size
+        model.partial_fit(cleaned[start:end], extras[start:end], labels[start:end], sample_weight[start:end])
+
+
+def load_corpus():
+    """Тренировочная часть корпуса: очищенные тексты, доп. признаки, метки"""
+    df = pd.read_csv(paths['combined'])
+    df['text'] = df['text'].astype(str)
+    # тот же сплит, что в train_model.py, на тестовой части — сравнение с основной моделью
+    train_df, test_df = train_test_split(df, test_size=0.2, stratify=df['label'], random_state=42)
+    cleaned, extras = _prepare(train_df['text'])
+    return cleaned, extras, train_df['label'].to_numpy(), test_df
+
+
+def bootstrap(args):
+    """Начальные веса: несколько эпох partial_fit по тренировочной части корпуса"""
+    cleaned, extras, labels, test_df = load_corpus()
+    weights = compute_class_weight('balanced', classes=online_model.CLASSES, y=labels)
+    model = online_model.OnlineModel(class_weight=dict(zip(online_model.CLASSES, weights)))
+    rng = np.random.default_rng(42)
+    start = time.perf_counter()
+    for _ in range(args.epochs):
+        order = rng.permutation(len(labels))
+        fit_batches(model, [cleaned[i] for i in order], extras[order], labels[order], args.batch_size)
+    print(f"Начальное обучение: {len(labels)} строк x {args.epochs} эпох за {time.perf_counter() - start:.1f} с")
+
+    test_cleaned, test_extras = _prepare(test_df['text'])
+    y_true = (test_df['label'] == 'spam').to_numpy()
+    y_pred = model.predict_proba_many(test_cleaned, test_extras) > 0.5
+    print(f"Отложенная выборка: precision {precision_score(y_true, y_pred):.4f}, "
+          f"recall {recall_score(y_true, y_pred):.4f}")
+
+    # combined.csv решений из bot_votes.csv не содержит (их добавляет только create_test_data.py
+    # в train_data.csv), поэтому смещение остаётся 0: run/once дообучит модель на всём журнале
+    version = online_model.save_snapshot(model, paths['online'])
+    print(f"Снимок опубликован: {paths['online']} (версия {version})")
+
+
+def read_new_votes(path, offset):
+    """Строки журнала после offset: (тексты, метки, новое смещение)"""
+    if not os.path.exists(path):
+        return [], [], offset
+    size = os.path.getsize(path)
+    if size < offset:
+        # журнал пересоздан — читаем с начала
+        offset = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    # незаконченную последнюю строку оставляем до следующего прохода
+    end = data.rfind(b'\n') + 1
+    rows = list(csv.reader(io.StringIO(data[:end].decode('utf-8'), newline='')))
+    if offset == 0 and rows and rows[0][:2] == ['text', 'label']:
+        rows = rows[1:]
+    rows = [r for r in rows if len(r) >= 2 and r[0] and r[1] in ('ham', 'spam')]
+    return [r[0] for r in rows], [r[1] for r in rows], offset + end
+
+
+def update_once(model, corpus, args, rng):
+    """Дообучает model на новых строках журнала; True, если снимок опубликован"""
+    texts, labels, offset = read_new_votes(args.votes, model.state['votes_offset'])
+    if not texts:
+        model.state['votes_offset'] = offset
+        return False
+    cleaned, extras = _prepare(texts, use_cache=False)
+    labels = np.array(labels)
+    corpus_cleaned, corpus_extras, corpus_labels = corpus
+    start = time.perf_counter()
+    for _ in range(args.passes):
+        idx = rng.choice(len(corpus_labels), min(args.replay, len(corpus_labels)), replace=False)
+        batch_cleaned = cleaned + [corpus_cleaned[i] for i in idx]
+        batch_extras = np.vstack([extras, corpus_extras[idx]])
+        batch_labels = np.concatenate([labels, corpus_labels[idx]])
+        weights = np.concatenate([np.full(len(labels), args.vote_weight), np.ones(len(idx))])
+        order = rng.permutation(len(batch_labels))
+        fit_batches(model, [batch_cleaned[i] for i in order], batch_extras[order], batch_labels[order],
+                    args.batch_size, weights[order])
+    model.state['votes_offset'] = offset
+    version = online_model.save_snapshot(model, paths['online'])
+    print(f"{time.strftime('%H:%M:%S')} новых решений: {len(labels)} (спам: {int(np.sum(labels == 'spam'))}), "
+          f"дообучение {time.perf_counter() - start:.2f} с, снимок {version}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Дообучение онлайн-модели на журнале голосований')
+    parser.add_argument('command', choices=['bootstrap', 'run', 'once'])
+    parser.add_argument('--votes', default=paths['votes'], help='журнал голосований бота')
+    parser.add_argument('--epochs', type=int, default=5, help='эпох начального обучения')
+    parser.add_argument('--batch-size', type=int, default=64, help='размер пакета partial_fit')
+    parser.add_argument('--vote-weight', type=float, default=5.0, help='вес решения из журнала')
+    parser.add_argument('--passes', type=int, default=3, help='проходов по новым строкам журнала')
+    parser.add_argument('--replay', type=int, default=256, help='строк корпуса, подмешиваемых к каждому проходу')
+    parser.add_argument('--interval', type=float, default=60, help='как часто (с) проверять журнал')
+    args = parser.parse_args()
+
+    if args.command == 'bootstrap':
+        bootstrap(args)
+        return
+    model = online_model.load_snapshot(paths['online'])
+    print(f"Загружен снимок {model.version}: {model.state['rows']} строк, смещение журнала {model.state['votes_offset']}")
+    corpus = load_corpus()[:3]
+    rng = np.random.default_rng()
+    if args.command == 'once':
+        if not update_once(model, corpus, args, rng):
+            print("Новых решений нет")
+        return
+    while True:
+        update_once(model, corpus, args, rng)
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Модель для дообучения на лету: SGDClassifier (log_loss) по хешированным
+словам и биграммам clean_text и доп. признакам (log1p / 8). Пространство
+признаков фиксированного размера, словарь не нужен, поэтому веса можно
+обновлять partial_fit на новых сообщениях без переобучения с нуля.
+
+    <online>/current.json        {"version": "..."} — активный снимок
+    <online>/<version>.pkl       SGDClassifier, размер пространства и состояние (joblib)
+
+Снимки публикует src/online_learning.py, бот подхватывает их при
+ONLINE_MODEL=1 так же, как переобученную модель.
+"""
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from scipy.sparse import csr_matrix, hstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+N_FEATURES = 2 ** 18
+CLASSES = np.array(['ham', 'spam'])
+KEEP_SNAPSHOTS = 3
+# log1p доп. признаков делится на это число, чтобы они были соизмеримы с нормированным текстом:
+# без этого шаги SGD по ним раскачивают модель
+EXTRA_SCALE = 8
+
+
+class OnlineModel:
+    def __init__(self, classifier=None, n_features=N_FEATURES, class_weight=None):
+        self.n_features = n_features
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, ngram_range=(1, 2), alternate_sign=False, norm='l2'
+        )
+        self.classifier = classifier or SGDClassifier(
+            loss='log_loss', alpha=3e-5, class_weight=class_weight, random_state=42
+        )
+        self.version = None
+        # сколько строк и пакетов прошло через partial_fit, докуда прочитан журнал голосований
+        self.state = {'rows': 0, 'batches': 0, 'votes_offset': 0}
+
+    def features(self, cleaned_texts, extras):
+        extra = csr_matrix(np.log1p(np.asarray(extras, dtype=np.float64)) / EXTRA_SCALE)
+        return hstack([self.vectorizer.transform(cleaned_texts), extra]).tocsr()
+
+    def partial_fit(self, cleaned_texts, extras, labels, sample_weight=None):
+        X = self.features(cleaned_texts, extras)
+        self.classifier.partial_fit(X, np.asarray(labels), classes=CLASSES, sample_weight=sample_weight)
+        self.state['rows'] += len(labels)
+        self.state['batches'] += 1
+
+    @property
+    def extra_weights(self):
+        return self.classifier.coef_[0][self.n_features:]
+
+    def predict_proba_many(self, cleaned_texts, extras):
+        """Вероятности спама, тот же интерфейс, что у FusedLinearScorer"""
+        spam_col = list(self.classifier.classes_).index('spam')
+        return self.classifier.predict_proba(self.features(cleaned_texts, extras))[:, spam_col]
+
+
+def save_snapshot(model, snapshot_dir):
+    """Сохраняет новый снимок и делает его активным; возвращает версию"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = time.strftime('%Y%m%d_%H%M%S') + f"_{model.state['batches']:06d}"
+    model.version = version
+    path = os.path.join(snapshot_dir, f'{version}.pkl')
+    # сам OnlineModel не сохраняется: скрипты и бот импортируют модуль под разными именами
+    joblib.dump({'classifier': model.classifier, 'n_features': model.n_features, 'state': model.state}, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+    pointer_tmp = os.path.join(snapshot_dir, 'current.json.tmp')
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, **model.state}, f)
+    os.replace(pointer_tmp, os.path.join(snapshot_dir, 'current.json'))
+
+    snapshots = sorted(name for name in os.listdir(snapshot_dir) if name.endswith('.pkl'))
+    for old in snapshots[:-KEEP_SNAPSHOTS]:
+        if old != f'{version}.pkl':
+            os.remove(os.path.join(snapshot_dir, old))
+    return version
+
+
+def load_snapshot(snapshot_dir):
+    """Активный снимок (из current.json)"""
+    with open(os.path.join(snapshot_dir, 'current.json'), encoding='utf-8') as f:
+        version = json.load(f)['version']
+    data = joblib.load(os.path.join(snapshot_dir, f'{version}.pkl'))
+    model = OnlineModel(data['classifier'], data['n_features'])
+    model.state = data['state']
+    model.version = version
+    return model
@@ -0,0 +1,204 @@
+"""
+Подготовка данных, обучение и оценка одной командой. Каждый этап объявляет
+входные и выходные файлы. Этап пропускается, если отпечатки входов (и кода
+этапа) совпадают с прошлым успешным запуском, а выходы на месте и не
+менялись. Отпечатки хранятся в data/processed/pipeline_state.json.
+
+    python src/pipeline.py                  # все этапы: combine, split, train, evaluate
+    python src/pipeline.py train evaluate   # только указанные
+    python src/pipeline.py --force train    # выполнить, даже если ничего не изменилось
+    python src/pipeline.py --list           # этапы, их входы/выходы и будут ли они выполнены
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import utils
+
+paths = utils.get_paths()
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+src_dir = os.path.join(project_root, 'src')
+STATE_PATH = os.path.join(project_root, 'data', 'processed', 'pipeline_state.json')
+
+
+def _combine():
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    import combine_data
+    combine_data.combine_data()
+
+
+def _split():
+    import create_test_data
+    create_test_data.create_test_data()
+
+
+def _train():
+    import train_model
+    train_model.train_from_csv(paths['train'])
+
+
+def _evaluate():
+    import evaluate
+    evaluate.evaluate_model()
+
+
+class Stage:
+    def __init__(self, name, func, inputs, outputs, code=(), optional_inputs=(), extra=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.optional_inputs = list(optional_inputs)  # учитываются, только если существуют
+        self.outputs = list(outputs)
+        self.code = list(code)
+        self.extra = extra  # () -> строка, тоже входит в отпечаток (например, настройка из окружения)
+
+    def missing_inputs(self):
+        return [p for p in self.inputs if not os.path.exists(p)]
+
+    def fingerprint(self):
+        files = self.inputs + [p for p in self.optional_inputs if os.path.exists(p)] + self.code
+        fp = {_rel(p): file_digest(p) for p in files}
+        if self.extra is not None:
+            fp['extra'] = self.extra()
+        return fp
+
+    def outputs_fingerprint(self):
+        return {_rel(p): file_digest(p) for p in self.outputs}
+
+
+STAGES = [
+    Stage('combine', _combine,
+          inputs=[paths['ham'], paths['spam']],
+          outputs=[paths['combined']], code=[os.path.join(project_root, 'combine_data.py')]),
+    # bot_votes.csv подмешивается здесь, а не в combine: исходных ham.csv/spam.csv обычно нет,
+    # и combine пропускается
+    Stage('split', _split,
+          inputs=[paths['combined']], optional_inputs=[paths['votes']], outputs=[paths['train'], paths['test']],
+          code=[os.path.join(src_dir, 'create_test_data.py')]),
+    Stage('train', _train,
+          inputs=[paths['train']],
+          outputs=[paths['model'], paths['vectorizer'], os.path.join(paths['bundle'], 'current.json'),
+                   os.path.join(paths['lemma_table'], 'manifest.json')],
+          code=[os.path.join(src_dir, name) for name in
+                ('train_model.py', 'preprocessing.py', 'model_bundle.py', 'scorer.py', 'lemma_table.py',
+                 'clean_cache.py', 'utils.py')],
+          extra=lambda: f"MODEL_PRECISION={os.getenv('MODEL_PRECISION', 'float64')}"),
+    Stage('evaluate', _evaluate,
+          inputs=[paths['model'], paths['vectorizer'], paths['test']], outputs=[paths['confusion_matrix']],
+          code=[os.path.join(src_dir, 'evaluate.py'), os.path.join(src_dir, 'preprocessing.py')]),
+]
+
+
+def _rel(path):
+    return os.path.relpath(path, project_root)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha1 содержимого файла; None, если файла нет"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp = STATE_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+
+def plan(stage, state, force=False):
+    """Что делать с этапом: ('run' | 'skip' | 'error', причина)"""
+    missing = stage.missing_inputs()
+    outputs_exist = all(os.path.exists(p) for p in stage.outputs)
+    if missing:
+        if outputs_exist:
+            # например, исходные ham.csv/spam.csv не хранятся, а combined.csv уже есть
+            return 'skip', f"нет входов ({', '.join(map(_rel, missing))}), выходы уже есть"
+        return 'error', f"нет входов: {', '.join(map(_rel, missing))}"
+    if force:
+        return 'run', 'принудительно'
+    previous = state.get(stage.name)
+    if previous is None:
+        return 'run', 'ещё не выполнялся'
+    if not outputs_exist:
+        return 'run', 'нет выходов'
+    if previous['inputs'] != stage.fingerprint():
+        changed = sorted(k for k, v in stage.fingerprint().items() if previous['inputs'].get(k) != v)
+        return 'run', f"изменились: {', '.join(changed)}"
+    if previous['outputs'] != stage.outputs_fingerprint():
+        return 'run', 'выходы изменены вне пайплайна'
+    return 'skip', 'входы не изменились'
+
+
+def run(names, force=False):
+    state = load_state()
+    timings = []
+    for stage in STAGES:
+        if stage.name not in names:
+            continue
+        action, reason = plan(stage, state, force)
+        if action == 'error':
+            raise SystemExit(f"Этап {stage.name}: {reason}")
+        if action == 'skip':
+            print(f"== {stage.name}: пропущен ({reason})")
+            timings.append((stage.name, 'пропущен', 0.0))
+            continue
+        print(f"== {stage.name}: выполняется ({reason})")
+        start = time.perf_counter()
+        stage.func()
+        elapsed = time.perf_counter() - start
+        # отпечатки входов снимаются после этапа: входы не должны меняться во время него
+        state[stage.name] = {'inputs': stage.fingerprint(), 'outputs': stage.outputs_fingerprint(),
+                             'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seconds': round(elapsed, 3)}
+        save_state(state)
+        timings.append((stage.name, 'выполнен', elapsed))
+
+    print("\nЭтап        статус       время, с")
+    for name, status, elapsed in timings:
+        print(f"{name:<11} {status:<12} {elapsed:8.2f}")
+    print(f"{'всего':<11} {'':<12} {sum(t for _, _, t in timings):8.2f}")
+
+
+def main():
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description='Пайплайн подготовки данных и обучения модели')
+    parser.add_argument('stages', nargs='*', help=f"этапы из {', '.join(names)} (по умолчанию все)")
+    parser.add_argument('--force', action='store_true', help='выполнить этапы без проверки отпечатков')
+    parser.add_argument('--list', action='store_true', help='показать этапы и план, ничего не выполняя')
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in names]
+    if unknown:
+        parser.error(f"неизвестные этапы: {', '.join(unknown)}")
+    selected = args.stages or names
+
+    if args.list:
+        state = load_state()
+        for stage in STAGES:
+            action, reason = plan(stage, state, args.force)
+            mark = action if stage.name in selected else 'не выбран'
+            print(f"{stage.name}: {mark} ({reason})")
+            print(f"  входы:  {', '.join(map(_rel, stage.inputs + stage.optional_inputs))}")
+            print(f"  выходы: {', '.join(map(_rel, stage.outputs))}")
+        return
+    run(selected, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,276 @@
 import re
-import nltk
-from nltk.corpus import stopwords
-from pymorphy2 import MorphAnalyzer
+from collections import OrderedDict
+import numpy as np
 import string
 
-morph = MorphAnalyzer()
-stop_words = None
+_morph = None
 
-def ensure_nltk_resources():
-    try:
-        _ = stopwords.words('russian')
-    except LookupError:
-        nltk.download('stopwords')
+# русские стоп-слова (список nltk.corpus.stopwords 'russian'), встроены в пакет,
+# чтобы бот не скачивал корпус NLTK и работал без сети
+STOP_WORDS = frozenset([
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она', 'так',
+    'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее', 'мне', 'было',
+    'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг',
+    'ли', 'если', 'уже', 'или', 'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять', 'уж',
+    'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они', 'тут', 'где', 'есть',
+    'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем', 'была', 'сам', 'чтоб', 'без', 'будто', 'чего',
+    'раз', 'тоже', 'себе', 'под', 'будет', 'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого',
+    'какой', 'совсем', 'ним', 'здесь', 'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее',
+    'сейчас', 'были', 'куда', 'зачем', 'всех', 'никогда', 'можно', 'при', 'наконец', 'два', 'об',
+    'другой', 'хоть', 'после', 'над', 'больше', 'тот', 'через', 'эти', 'нас', 'про', 'всего',
+    'них', 'какая', 'много', 'разве', 'три', 'эту', 'моя', 'впрочем', 'хорошо', 'свою', 'этой',
+    'перед', 'иногда', 'лучше', 'чуть', 'том', 'нельзя', 'такой', 'им', 'более', 'всегда',
+    'конечно', 'всю', 'между'
+])
 
-def clean_text(text):
-    global stop_words
-    if stop_words is None:
-        ensure_nltk_resources()
-        stop_words_set = set(stopwords.words('russian'))
-        stop_words = stop_words_set
+_URL_RE = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+_EMAIL_RE = re.compile(r'\S+@\S+')
+_PHONE_RE = re.compile(r'[\+\(]?[1-9][0-9 .\-\(\)]{8,}[0-9]')
+_PUNCT_DIGITS = str.maketrans('', '', string.punctuation + string.digits)
+_NON_CYRILLIC_RE = re.compile(r'[^\u0430-\u044f\u0451\s]')
+
+
+def get_morph():
+    """MorphAnalyzer pymorphy2, создаётся при первом обращении"""
+    global _morph
+    if _morph is None:
+        from pymorphy2 import MorphAnalyzer
+        _morph = MorphAnalyzer()
+    return _morph
+
+
+class LemmaCache:
+    """
+    Ограниченный LRU-кэш нормальных форм pymorphy2.
+    Общий для бота и скриптов обучения: clean_text лемматизирует через него.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lemmatize(self, word):
+        data = self._data
+        lemma = data.get(word)
+        if lemma is not None:
+            data.move_to_end(word)
+            self.hits += 1
+            return lemma
+        self.misses += 1
+        lemma = get_morph().parse(word)[0].normal_form
+        data[word] = lemma
+        if len(data) > self.max_size:
+            data.popitem(last=False)
+            self.evictions += 1
+        return lemma
+
+    def lemmatize_many(self, words):
+        return [self.lemmatize(word) for word in words]
+
+    def resize(self, max_size):
+        """Меняет предельный размер, вытесняя самые старые записи"""
+        self.max_size = max_size
+        while len(self._data) > max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def preload(self, texts):
+        """Заполняет кэш словами из texts; счётчики после этого сбрасываются"""
+        for text in texts:
+            clean_text(text)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+    def drain(self):
+        """Счётчики с обнулением и текущий размер (для передачи из воркера пула)"""
+        snapshot = {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._data)}
+        self.hits = self.misses = self.evictions = 0
+        return snapshot
+
+    def merge(self, snapshot):
+        """Прибавляет счётчики из drain() другого процесса"""
+        self.hits += snapshot['hits']
+        self.misses += snapshot['misses']
+        self.evictions += snapshot['evictions']
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+lemma_cache = LemmaCache()
+# чем clean_text приводит слова к нормальной форме: кэш pymorphy2 или LemmaTable
+lemmatizer = lemma_cache
+
+def set_lemmatizer(new_lemmatizer):
+    """Подменяет лемматизатор clean_text (объект с методом lemmatize_many(words))"""
+    global lemmatizer
+    lemmatizer = new_lemmatizer
+
+def tokenize(text):
+    """Нормализует текст и возвращает слова без стоп-слов, до лемматизации"""
     text = text.lower()
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\S+@\S+', '', text)
-    text = re.sub(r'[\+\(]?[1-9][0-9 .\-\(\)]{8,}[0-9]', '', text)
-    text = text.translate(str.maketrans('', '', string.punctuation + string.digits))
-    text = re.sub(r'[^\u0430-\u044f\u0451\s]', '', text)
-    tokens = text.split()
-    tokens = [word for word in tokens if word not in stop_words]
-    tokens = [morph.parse(word)[0].normal_form for word in tokens]
-    return ' '.join(tokens)
+    text = _URL_RE.sub('', text)
+    text = _EMAIL_RE.sub('', text)
+    text = _PHONE_RE.sub('', text)
+    text = text.translate(_PUNCT_DIGITS)
+    text = _NON_CYRILLIC_RE.sub('', text)
+    # стоп-слова отбрасываются здесь же и до лемматизатора не доходят
+    return [word for word in text.split() if word not in STOP_WORDS]
+
+def lemmatize_tokens(tokens):
+    """Нормальные формы слов из tokenize(), через пробел"""
+    return ' '.join(lemmatizer.lemmatize_many(tokens))
+
+def clean_text(text):
+    return lemmatize_tokens(tokenize(text))
+
+def preprocessing_version():
+    """
+    Отпечаток кода clean_text: исходники функций очистки, стоп-слова и
+    версии pymorphy2 и его словарей. Меняется при любой правке clean_text,
+    по нему сбрасывается кэш очищенного текста (src/clean_cache.py).
+    """
+    import hashlib
+    import inspect
+    from importlib import metadata
+
+    h = hashlib.sha1()
+    for func in (tokenize, lemmatize_tokens, clean_text):
+        h.update(inspect.getsource(func).encode('utf-8'))
+    for pattern in (_URL_RE, _EMAIL_RE, _PHONE_RE, _NON_CYRILLIC_RE):
+        h.update(pattern.pattern.encode('utf-8'))
+    h.update(' '.join(sorted(STOP_WORDS)).encode('utf-8'))
+    for package in ('pymorphy2', 'pymorphy2-dicts-ru'):
+        try:
+            h.update(f'{package}=={metadata.version(package)}'.encode('utf-8'))
+        except metadata.PackageNotFoundError:
+            pass
+    return h.hexdigest()[:16]
+
+def _clean_chunk(texts):
+    return [clean_text(text) for text in texts]
+
+def clean_texts(texts, workers=1, chunk_size=1000, pool=None):
+    """
+    clean_text для списка текстов. При workers > 1 текст делится на части
+    по chunk_size строк, которые чистятся в пуле процессов (у каждого свой
+    кэш лемм); результат в исходном порядке и совпадает с последовательным.
+    pool — уже запущенный ProcessPoolExecutor (для многократных вызовов).
+    """
+    texts = list(texts)
+    if pool is None and (workers <= 1 or len(texts) <= chunk_size):
+        return _clean_chunk(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if pool is not None:
+        return [cleaned for chunk in pool.map(_clean_chunk, chunks) for cleaned in chunk]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [cleaned for chunk in pool.map(_clean_chunk, chunks) for cleaned in chunk]
+
+SPAM_KEYWORDS = ['бесплатно', 'выиграй', 'только сегодня', 'гарантия', 
+                 'срочно', 'акция', 'кэшбэк', 'скидка', 'реклама', 'зарабатываю',
+                 'зарабатывать', 'курьером', 'заработала', 'легкие деньги',
+                 'быстрый заработок', 'порно', 'легкая работа', 'много денег',
+                 'зарабатывать онлайн', 'заработок онлайн', 'зарабатываю онлайн',
+                 'пробник', 'пробники', 'пробнички', 'вложений', 'раскид', 'раскида',
+                 'нахуй']
+
+# порядок доп. признаков, в котором обучалась модель
+FEATURE_COLUMNS = ['length', 'exclamation_count', 'digit_count'] + [f'has_{k}' for k in SPAM_KEYWORDS]
+
+
+class KeywordAutomaton:
+    """
+    Автомат Ахо–Корасик по списку ключевых слов.
+    За один проход по тексту отмечает все ключевые слова, входящие в него
+    подстрокой (как str.contains), независимо от длины списка.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        goto = [{}]
+        outputs = [[]]
+        for i, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(i)
+
+        # переходы по суффиксным ссылкам сразу сворачиваются в детерминированный автомат,
+        # отсутствующий переход ведёт в корень
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = list(goto[0].values())
+        for state in queue:
+            outputs[state].extend(outputs[fail[state]])
+            trans = dict(delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                trans[ch] = nxt
+                queue.append(nxt)
+            delta[state] = trans
+        self._delta = delta
+        self._outputs = [tuple(o) for o in outputs]
+
+    def flags(self, text):
+        """Список 0/1 длины len(keywords): входит ли ключевое слово в text"""
+        found = [0] * len(self.keywords)
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            for i in outputs[state]:
+                found[i] = 1
+        return found
+
+
+keyword_automaton = KeywordAutomaton(SPAM_KEYWORDS)
 
 def extract_features(df):
     df['length'] = df['text'].apply(len)
     df['exclamation_count'] = df['text'].apply(lambda x: x.count('!'))
     df['digit_count'] = df['text'].apply(lambda x: sum(c.isdigit() for c in x))
-    spam_keywords = ['бесплатно', 'выиграй', 'только сегодня', 'гарантия', 
-                    'срочно', 'акция', 'кэшбэк', 'скидка', 'реклама', 'зарабатываю',
-                    'зарабатывать', 'курьером', 'заработала', 'легкие деньги',
-                    'быстрый заработок', 'порно', 'легкая работа', 'много денег',
-                    'зарабатывать онлайн', 'заработок онлайн', 'зарабатываю онлайн',
-                    'пробник', 'пробники', 'пробнички', 'вложений', 'раскид', 'раскида',
-                    'нахуй']
-    for keyword in spam_keywords:
-        df[f'has_{keyword}'] = df['text'].str.contains(keyword).astype(int)
+    flags = np.array([keyword_automaton.flags(x) for x in df['text']], dtype=np.int64).reshape(len(df), len(SPAM_KEYWORDS))
+    for i, keyword in enumerate(SPAM_KEYWORDS):
+        df[f'has_{keyword}'] = flags[:, i]
     return df
 
+def extract_features_row(text):
+    """Доп. признаки одного текста без pandas, в порядке FEATURE_COLUMNS"""
+    row = [len(text), text.count('!'), sum(c.isdigit() for c in text)]
+    row.extend(keyword_automaton.flags(text))
+    return np.array(row, dtype=np.int64)
+
+def extract_features_matrix(texts):
+    """Доп. признаки списка текстов: матрица (len(texts), len(FEATURE_COLUMNS))"""
+    out = np.zeros((len(texts), len(FEATURE_COLUMNS)), dtype=np.int64)
+    for i, text in enumerate(texts):
+        out[i] = extract_features_row(text)
+    return out
+
 
 def detect_single_chars_spam(text, threshold=0.7):
     """
@@ -0,0 +1,182 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+PRECISIONS = ('float64', 'float16', 'int8')
+
+
+def quantize(values, precision):
+    """
+    Переводит веса в заданную точность. Возвращает (массив, масштаб):
+    исходное значение ~ массив * масштаб. Для int8 масштаб подбирается
+    по максимальному модулю, для float16 и float64 он равен 1.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if precision == 'float64':
+        return values.copy(), 1.0
+    if precision == 'float16':
+        return values.astype(np.float16), 1.0
+    if precision == 'int8':
+        peak = float(np.max(np.abs(values))) if len(values) else 0.0
+        scale = peak / 127 if peak > 0 else 1.0
+        return np.round(values / scale).astype(np.int8), scale
+    raise ValueError(f"Неизвестная точность весов: {precision} (допустимо: {', '.join(PRECISIONS)})")
+
+
+class FusedLinearScorer:
+    """
+    TfidfVectorizer + LogisticRegression, свёрнутые в один линейный скорер.
+    Для каждого термина словаря хранится вес idf * coef, поэтому оценка
+    сообщения — это подсчёт токенов, L2-нормировка, скалярное произведение
+    и сигмоида, без sklearn, DataFrame и hstack.
+    """
+
+    def __init__(self, vocabulary, term_weights, idf, extra_weights, intercept,
+                 token_pattern=r"(?u)\b\w\w+\b", lowercase=True, sublinear_tf=False,
+                 binary=False, spam_is_positive=True, weight_scale=1.0, idf_scale=1.0):
+        # vocabulary — dict термин -> столбец или объект с методом lookup(tokens) (SortedVocabulary)
+        self.vocabulary = vocabulary
+        if hasattr(vocabulary, 'lookup'):
+            self._lookup = vocabulary.lookup
+        else:
+            self._lookup = lambda tokens: [vocabulary.get(t, -1) for t in tokens]
+        # term_weights и idf могут быть float16 или int8; реальные значения — массив * масштаб
+        self.term_weights = term_weights
+        self.idf = idf
+        self.weight_scale = float(weight_scale)
+        self.idf_scale = float(idf_scale)
+        self.extra_weights = extra_weights
+        self.intercept = float(intercept)
+        self.token_re = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        self.spam_is_positive = spam_is_positive
+
+    @classmethod
+    def from_sklearn(cls, model, vectorizer, positive_label='spam'):
+        """Собирает скорер из обученных LogisticRegression и TfidfVectorizer"""
+        if getattr(vectorizer, 'analyzer', 'word') != 'word' or tuple(vectorizer.ngram_range) != (1, 1):
+            raise ValueError("Поддерживаются только униграммы слов (analyzer='word', ngram_range=(1, 1))")
+        if vectorizer.norm != 'l2' or vectorizer.stop_words is not None or vectorizer.preprocessor is not None \
+                or vectorizer.tokenizer is not None:
+            raise ValueError("Неподдерживаемые параметры TfidfVectorizer")
+        if model.coef_.shape[0] != 1:
+            raise ValueError("Поддерживается только бинарная логистическая регрессия")
+
+        n_terms = len(vectorizer.vocabulary_)
+        coef = np.asarray(model.coef_[0], dtype=np.float64)
+        idf = np.asarray(vectorizer.idf_ if vectorizer.use_idf else np.ones(n_terms), dtype=np.float64)
+        classes = list(model.classes_)
+        return cls(
+            vocabulary=dict(vectorizer.vocabulary_),
+            term_weights=idf * coef[:n_terms],
+            idf=idf,
+            extra_weights=coef[n_terms:].copy(),
+            intercept=model.intercept_[0],
+            token_pattern=vectorizer.token_pattern,
+            lowercase=vectorizer.lowercase,
+            sublinear_tf=vectorizer.sublinear_tf,
+            binary=vectorizer.binary,
+            spam_is_positive=classes.index(positive_label) == 1,
+        )
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        """Собирает скорер из ModelBundle (массивы остаются отображёнными в память)"""
+        manifest = bundle.manifest
+        params = manifest['vectorizer']
+        if params['norm'] != 'l2':
+            raise ValueError("Поддерживается только norm='l2'")
+        n_terms = manifest['n_terms']
+        return cls(
+            vocabulary=bundle.vocabulary,
+            term_weights=bundle.term_weights,
+            idf=bundle.idf,
+            extra_weights=bundle.coef[n_terms:],
+            intercept=manifest['intercept'],
+            token_pattern=params['token_pattern'],
+            lowercase=params['lowercase'],
+            sublinear_tf=params['sublinear_tf'],
+            binary=params['binary'],
+            spam_is_positive=manifest['classes'].index(manifest['positive_label']) == 1,
+            weight_scale=manifest.get('weight_scale', 1.0),
+            idf_scale=manifest.get('idf_scale', 1.0),
+        )
+
+    @property
+    def precision(self):
+        dtype = np.dtype(self.term_weights.dtype)
+        return 'int8' if dtype == np.int8 else dtype.name
+
+    def quantize(self, precision):
+        """Копия скорера с весами словаря в точности precision (float64, float16, int8)"""
+        term_weights, weight_scale = quantize(np.asarray(self.term_weights, dtype=np.float64) * self.weight_scale,
+                                              precision)
+        idf, idf_scale = quantize(np.asarray(self.idf, dtype=np.float64) * self.idf_scale, precision)
+        return FusedLinearScorer(
+            vocabulary=self.vocabulary,
+            term_weights=term_weights,
+            idf=idf,
+            extra_weights=self.extra_weights,
+            intercept=self.intercept,
+            token_pattern=self.token_re.pattern,
+            lowercase=self.lowercase,
+            sublinear_tf=self.sublinear_tf,
+            binary=self.binary,
+            spam_is_positive=self.spam_is_positive,
+            weight_scale=weight_scale,
+            idf_scale=idf_scale,
+        )
+
+    def nbytes(self):
+        """Объём весов и словаря-массива в байтах (без dict-словаря)"""
+        total = self.term_weights.nbytes + self.idf.nbytes + np.asarray(self.extra_weights).nbytes
+        vocabulary = self.vocabulary
+        if hasattr(vocabulary, 'terms'):
+            total += vocabulary.terms.nbytes + vocabulary.columns.nbytes
+        return total
+
+    def _text_score(self, cleaned):
+        if self.lowercase:
+            cleaned = cleaned.lower()
+        counts = Counter(int(idx) for idx in self._lookup(self.token_re.findall(cleaned)) if idx >= 0)
+        if not counts:
+            return 0.0
+        dot = 0.0
+        norm = 0.0
+        for idx, tf in counts.items():
+            if self.binary:
+                tf = 1.0
+            elif self.sublinear_tf:
+                tf = 1.0 + math.log(tf)
+            dot += tf * float(self.term_weights[idx])
+            x = tf * float(self.idf[idx])
+            norm += x * x
+        return dot * self.weight_scale / (math.sqrt(norm) * self.idf_scale)
+
+    def _extra_score(self, extra):
+        w = self.extra_weights
+        extra = np.asarray(extra, dtype=np.float64)
+        n = min(len(extra), len(w))
+        return float(np.dot(extra[:n], w[:n]))
+
+    def decision(self, cleaned, extra):
+        """Значение решающей функции для очищенного текста и доп. признаков"""
+        return self._text_score(cleaned) + self._extra_score(extra) + self.intercept
+
+    def predict_proba(self, cleaned, extra):
+        """Вероятность спама"""
+        z = self.decision(cleaned, extra)
+        if not self.spam_is_positive:
+            z = -z
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def predict_proba_many(self, cleaned_texts, extras):
+        """Вероятности спама для списка текстов (extras — матрица строк признаков)"""
+        return np.array([self.predict_proba(t, x) for t, x in zip(cleaned_texts, extras)])
@@ -3,62 +3,101 @@ from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 import joblib
-import numpy as np
 from scipy.sparse import hstack
 import utils
 import preprocessing
+import clean_cache
+import lemma_table
+import model_bundle
 import os
+import time
 
 paths = utils.get_paths()
 
 
-df = pd.read_csv(paths['combined'])
-print(f"Загружено {len(df)} сообщений")
-
-if 'cleaned_text' not in df.columns:
-    df['text'] = df['text'].astype(str).apply(preprocessing.clean_text)
-
-features_df = preprocessing.extract_features(df.copy())
-
-train_df, test_df = train_test_split(
-    features_df, 
-    test_size=0.2,
-    stratify=features_df['label'],
-    random_state=42
-)
-print(f"Тренировочные данные: {len(train_df)} сообщений")
-print(f"Тестовые данные: {len(test_df)} сообщений")
-
-X_train_text = train_df['text']
-y_train = train_df['label']
-X_test_text = test_df['text']
-y_test = test_df['label']
-
-print("Векторизация текста...")
-vectorizer = TfidfVectorizer(
-    max_features=5000,
-    stop_words=None,
-    ngram_range=(1, 1)
-)
-X_train_vec = vectorizer.fit_transform(X_train_text)
-X_test_vec = vectorizer.transform(X_test_text)
-print(f"Размерность данных: {X_train_vec.shape}")
-
-feature_cols = [col for col in train_df.columns if col not in ['text', 'label']]
-X_train_add = train_df[feature_cols].values
-X_test_add = test_df[feature_cols].values
-
-X_train_full = hstack([X_train_vec, X_train_add])
-X_test_full = hstack([X_test_vec, X_test_add])
-
-print("\nОбучение модели")
-model = LogisticRegression(
-    class_weight='balanced', 
-    max_iter=1000
-)
-model.fit(X_train_full, y_train)
-print("Обучение завершено.")
-
-joblib.dump(model, paths['model'])
-joblib.dump(vectorizer, paths['vectorizer'])
-print("Модель и векторизатор сохранены в папке models/")
+def clean_corpus(df):
+    """Очищает столбец text (через кэш и пул процессов)"""
+    if 'cleaned_text' not in df.columns:
+        # число процессов для очистки текста (1 — в текущем процессе)
+        workers = int(os.getenv('PREPROCESS_WORKERS', str(os.cpu_count() or 1)))
+        # кэш очищенного текста (0 — чистить весь корпус заново)
+        use_cache = os.getenv('CLEAN_CACHE', '1') == '1'
+        start = time.perf_counter()
+        df['text'] = clean_cache.clean_with_cache(df['text'].astype(str), paths['clean_cache'], workers, use_cache)
+        elapsed = time.perf_counter() - start
+        print(f"Очистка текста: {len(df)} строк за {elapsed:.1f} с ({len(df) / elapsed:.0f} строк/с, процессов: {workers})")
+        if workers <= 1:
+            print(f"Кэш лемм: {preprocessing.lemma_cache.get_stats()}")
+    return df
+
+
+def train(train_df):
+    """Обучает векторизатор и модель на очищенных данных с доп. признаками"""
+    X_train_text = train_df['text']
+    y_train = train_df['label']
+
+    print("Векторизация текста...")
+    vectorizer = TfidfVectorizer(
+        max_features=5000,
+        stop_words=None,
+        ngram_range=(1, 1)
+    )
+    X_train_vec = vectorizer.fit_transform(X_train_text)
+    print(f"Размерность данных: {X_train_vec.shape}")
+
+    feature_cols = [col for col in train_df.columns if col not in ['text', 'label']]
+    X_train_add = train_df[feature_cols].values
+    X_train_full = hstack([X_train_vec, X_train_add])
+
+    print("\nОбучение модели")
+    model = LogisticRegression(
+        class_weight='balanced',
+        max_iter=1000
+    )
+    model.fit(X_train_full, y_train)
+    print("Обучение завершено.")
+    return model, vectorizer, feature_cols
+
+
+def save(model, vectorizer, feature_cols):
+    """Сохраняет модель, векторизатор, бандл и таблицу лемм"""
+    joblib.dump(model, paths['model'])
+    joblib.dump(vectorizer, paths['vectorizer'])
+    print("Модель и векторизатор сохранены в папке models/")
+
+    precision = os.getenv('MODEL_PRECISION', 'float64')
+    bundle_version = model_bundle.export_bundle(model, vectorizer, feature_cols, paths['bundle'], precision=precision)
+    print(f"Бандл модели сохранён: {paths['bundle']} (версия {bundle_version}, веса {precision})")
+
+    table = lemma_table.build_from_paths(paths, vectorizer)
+    print(f"Таблица лемм сохранена: {len(table)} словоформ")
+
+
+def train_from_csv(path):
+    """Обучение на готовой тренировочной выборке (этап train в pipeline.py)"""
+    train_df = pd.read_csv(path)
+    print(f"Тренировочные данные: {len(train_df)} сообщений")
+    train_df = preprocessing.extract_features(clean_corpus(train_df))
+    save(*train(train_df))
+
+
+def main():
+    df = pd.read_csv(paths['combined'])
+    print(f"Загружено {len(df)} сообщений")
+
+    features_df = preprocessing.extract_features(clean_corpus(df))
+
+    train_df, test_df = train_test_split(
+        features_df,
+        test_size=0.2,
+        stratify=features_df['label'],
+        random_state=42
+    )
+    print(f"Тренировочные данные: {len(train_df)} сообщений")
+    print(f"Тестовые данные: {len(test_df)} сообщений")
+
+    save(*train(train_df))
+
+
+if __name__ == '__main__':
+    main()
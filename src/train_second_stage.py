@@ -0,0 +1,92 @@
+"""
+Вторая, более тяжёлая модель для спорных сообщений: символьные n-граммы
+исходного текста (ловят «с.п.а.м», латиницу вместо кириллицы, ссылки и
+эмодзи, которые clean_text выбрасывает) + логистическая регрессия.
+Бот вызывает её только для сообщений, чья вероятность по основной модели
+попала в полосу неуверенности.
+
+    python src/train_second_stage.py [--low 0.35] [--high 0.65]
+"""
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.sparse import hstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import precision_score, recall_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+import utils
+import preprocessing
+
+paths = utils.get_paths()
+
+
+def build_pipeline():
+    return Pipeline([
+        ('tfidf', TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=(2, 5),
+            min_df=2,
+            max_features=200000,
+            sublinear_tf=True,
+        )),
+        ('clf', LogisticRegression(class_weight='balanced', max_iter=2000, C=10)),
+    ])
+
+
+def first_stage_proba(texts):
+    """Вероятности спама основной моделью (как в боте)"""
+    model = joblib.load(paths['model'])
+    vectorizer = joblib.load(paths['vectorizer'])
+    cleaned = [preprocessing.clean_text(t) for t in texts]
+    add = preprocessing.extract_features_matrix(cleaned)
+    spam_col = list(model.classes_).index('spam')
+    return model.predict_proba(hstack([vectorizer.transform(cleaned), add]).tocsr())[:, spam_col]
+
+
+def report(name, y_true, y_pred):
+    print(f"  {name:<28} precision {precision_score(y_true, y_pred):.4f}  recall {recall_score(y_true, y_pred):.4f}  "
+          f"ошибок {int(np.sum(y_true != y_pred))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обучение второй модели для спорных сообщений')
+    parser.add_argument('--low', type=float, default=0.35, help='нижняя граница полосы неуверенности')
+    parser.add_argument('--high', type=float, default=0.65, help='верхняя граница полосы неуверенности')
+    args = parser.parse_args()
+
+    df = pd.read_csv(paths['combined'])
+    df['text'] = df['text'].astype(str)
+    # тот же сплит, что в train_model.py и create_test_data.py
+    train_df, test_df = train_test_split(df, test_size=0.2, stratify=df['label'], random_state=42)
+    print(f"Тренировочные данные: {len(train_df)}, тестовые: {len(test_df)}")
+
+    pipeline = build_pipeline()
+    pipeline.fit(train_df['text'].str.lower(), train_df['label'])
+    joblib.dump(pipeline, paths['second_stage'])
+    print(f"Вторая модель сохранена в {paths['second_stage']}")
+
+    texts = test_df['text'].tolist()
+    y_true = (test_df['label'] == 'spam').values
+    first = first_stage_proba(texts)
+    spam_col = list(pipeline.classes_).index('spam')
+    second = pipeline.predict_proba([t.lower() for t in texts])[:, spam_col]
+    band = (first >= args.low) & (first <= args.high)
+    cascade = np.where(band, second > 0.5, first > 0.5)
+
+    print(f"\nОтложенная выборка: {len(texts)} сообщений, в полосе [{args.low}, {args.high}]: "
+          f"{int(band.sum())} ({band.mean():.1%})")
+    report('основная модель', y_true, first > 0.5)
+    report('вторая модель на всём', y_true, second > 0.5)
+    report('каскад', y_true, cascade)
+    if band.any():
+        report('основная, только полоса', y_true[band], first[band] > 0.5)
+        report('вторая, только полоса', y_true[band], second[band] > 0.5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Обучение онлайн-модели (src/online_model.py) на корпусе, который не
+помещается в память. CSV читается частями по --chunk-size строк; каждая
+часть очищается, хешируется (HashingVectorizer не хранит словаря) и сразу
+уходит в partial_fit. В памяти одновременно одна часть, веса модели и
+LRU-кэш лемм, поэтому пиковый RSS не растёт с размером корпуса.
+
+SGD чувствителен к порядку строк: части только из спама или только из
+не-спама раскачивают модель. Строки внутри части перемешиваются, но
+корпус, отсортированный по метке (как combined.csv), нужно перемешать
+заранее (shuf); о частях с одной меткой скрипт предупреждает.
+
+Строки, у которых crc32(текст) % 5 == 0, в обучение не идут: по ним
+после обучения потоково считаются precision и recall.
+
+    python src/train_streaming.py [--csv data/combined.csv] [--chunk-size 10000]
+                                  [--epochs 3] [--output models/online]
+
+Снимок публикуется так же, как из src/online_learning.py bootstrap: бот
+с ONLINE_MODEL=1 подхватит его, online_learning.py run дообучит дальше,
+начиная с первой строки журнала голосований.
+"""
+import argparse
+import os
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import utils
+import preprocessing
+import online_model
+
+paths = utils.get_paths()
+
+
+def is_holdout(text):
+    return zlib.crc32(text.encode('utf-8')) % 5 == 0
+
+
+def read_chunks(path, chunk_size):
+    """Части CSV: (тексты, метки) с разделением на обучение и отложенные строки"""
+    for chunk in pd.read_csv(path, usecols=['text', 'label'], chunksize=chunk_size):
+        chunk = chunk.dropna()
+        texts = chunk['text'].astype(str).tolist()
+        labels = chunk['label'].to_numpy()
+        holdout = np.array([is_holdout(t) for t in texts], dtype=bool)
+        yield texts, labels, holdout
+
+
+def count_labels(path, chunk_size):
+    counts = Counter()
+    for chunk in pd.read_csv(path, usecols=['label'], chunksize=chunk_size):
+        counts.update(chunk['label'].dropna())
+    return counts
+
+
+def train_streaming(csv_path, chunk_size=10000, epochs=3, workers=1, output=None, seed=42):
+    """Обучает OnlineModel по частям CSV; возвращает модель и статистику прогона"""
+    counts = count_labels(csv_path, chunk_size)
+    total = sum(counts[c] for c in online_model.CLASSES)
+    class_weight = {c: total / (len(online_model.CLASSES) * counts[c]) for c in online_model.CLASSES}
+    model = online_model.OnlineModel(class_weight=class_weight)
+    rng = np.random.default_rng(seed)
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    start = time.perf_counter()
+    rows = 0
+    single_label = 0
+    try:
+        for epoch in range(epochs):
+            for texts, labels, holdout in read_chunks(csv_path, chunk_size):
+                train_idx = np.flatnonzero(~holdout)
+                train_idx = train_idx[rng.permutation(len(train_idx))]
+                cleaned = preprocessing.clean_texts([texts[i] for i in train_idx], workers, pool=pool)
+                extras = preprocessing.extract_features_matrix(cleaned)
+                model.partial_fit(cleaned, extras, labels[train_idx])
+                rows += len(train_idx)
+                if epoch == 0 and len(set(labels[train_idx])) < 2:
+                    single_label += 1
+            if single_label and epoch == 0:
+                print(f"Внимание: частей с одной меткой {single_label} — корпус стоит перемешать")
+            print(f"Эпоха {epoch + 1}/{epochs}: {rows} строк, {rows / (time.perf_counter() - start):.0f} строк/с, "
+                  f"пиковый RSS {utils.peak_rss_mb():.0f} МБ")
+        train_seconds = time.perf_counter() - start
+
+        # отложенные строки: счётчики матрицы ошибок, без хранения самих строк
+        tp = fp = fn = 0
+        for texts, labels, holdout in read_chunks(csv_path, chunk_size):
+            idx = np.flatnonzero(holdout)
+            if not len(idx):
+                continue
+            cleaned = preprocessing.clean_texts([texts[i] for i in idx], workers, pool=pool)
+            predicted = model.predict_proba_many(cleaned, preprocessing.extract_features_matrix(cleaned)) > 0.5
+            actual = labels[idx] == 'spam'
+            tp += int(np.sum(predicted & actual))
+            fp += int(np.sum(predicted & ~actual))
+            fn += int(np.sum(~predicted & actual))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if output:
+        # смещение журнала голосований остаётся 0: в CSV корпуса решений из bot_votes.csv нет,
+        # online_learning.py run/once дообучит модель на всём журнале
+        online_model.save_snapshot(model, output)
+    return model, {
+        'rows': total,
+        'train_rows': rows // max(epochs, 1),
+        'train_seconds': train_seconds,
+        'rows_per_sec': rows / train_seconds if train_seconds else 0.0,
+        'precision': tp / (tp + fp) if tp + fp else 0.0,
+        'recall': tp / (tp + fn) if tp + fn else 0.0,
+        'peak_rss_mb': utils.peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Потоковое обучение онлайн-модели на большом CSV')
+    parser.add_argument('--csv', default=paths['combined'], help='CSV со столбцами text и label')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='строк в одной части')
+    parser.add_argument('--epochs', type=int, default=3, help='проходов по корпусу')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('PREPROCESS_WORKERS', str(os.cpu_count() or 1))),
+                        help='процессов для очистки текста')
+    parser.add_argument('--output', default=paths['online'], help='куда опубликовать снимок')
+    args = parser.parse_args()
+
+    model, stats = train_streaming(args.csv, args.chunk_size, args.epochs, args.workers, args.output)
+    print(f"Строк: {stats['rows']}, в обучении {stats['train_rows']}, "
+          f"{stats['train_seconds']:.1f} с ({stats['rows_per_sec']:.0f} строк/с)")
+    print(f"Отложенные строки: precision {stats['precision']:.4f}, recall {stats['recall']:.4f}")
+    print(f"Пиковый RSS: {stats['peak_rss_mb']:.0f} МБ")
+    print(f"Снимок опубликован: {args.output} (версия {model.version})")
+
+
+if __name__ == '__main__':
+    main()
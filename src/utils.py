@@ -22,6 +22,19 @@ def create_directories():
         os.makedirs(dir_path, exist_ok=True)
         print(f"Директория создана: {dir_path}")
 
+def peak_rss_mb():
+    """Пиковый RSS процесса, МБ. VmHWM, а не ru_maxrss: ru_maxrss переживает exec и у дочернего
+    процесса включает память родителя на момент fork"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
 def get_paths():
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
@@ -31,8 +44,15 @@ def get_paths():
         'spam': os.path.join(project_root, 'data', 'processed', 'spam.csv'),
         'train': os.path.join(project_root, 'data', 'processed', 'train_data.csv'),
         'test': os.path.join(project_root, 'data', 'processed', 'test_data.csv'),
+        'votes': os.path.join(project_root, 'bot_votes.csv'),
+        'clean_cache': os.path.join(project_root, 'data', 'processed', 'clean_cache.npz'),
+        'normal_forms': os.path.join(project_root, 'data', 'processed', 'normal_forms.json.gz'),
         'model': os.path.join(project_root, 'models', 'spam_model.pkl'),
         'vectorizer': os.path.join(project_root, 'models', 'vectorizer.pkl'),
+        'lemma_table': os.path.join(project_root, 'models', 'lemma_table'),
+        'bundle': os.path.join(project_root, 'models', 'bundle'),
+        'online': os.path.join(project_root, 'models', 'online'),
+        'second_stage': os.path.join(project_root, 'models', 'second_stage.pkl'),
         'confusion_matrix': os.path.join(project_root, 'results', 'confusion_matrix.png'),
     }
     return paths
\ No newline at end of file